@@ -1,7 +1,10 @@
-from .base_model import Base, UUIDpk, created_at, updated_at, MemberRole, ApplicationStatus
+from .base_model import Base, UUIDpk, created_at, updated_at, MemberRole, ApplicationStatus, OutboxStatus
 from .member import Member
 from .invite import Invite
 from .application import Application
+from .fsm_state import FsmState
+from .outbox import OutboxMessage
+from .inbox import InboxUpdate
 
 __all__ = [
     "Base",
@@ -10,9 +13,13 @@ __all__ = [
     "updated_at",
     "MemberRole",
     "ApplicationStatus",
+    "OutboxStatus",
     "Member",
     "Invite",
     "Application",
+    "FsmState",
+    "OutboxMessage",
+    "InboxUpdate",
 ]
 
 
@@ -0,0 +1,23 @@
+from __future__ import annotations
+from .base_model import *
+
+
+class InboxUpdate(Base):
+    __tablename__ = "update_inbox"
+    __table_args__ = (
+        Index(
+            "ix_update_inbox_unprocessed",
+            "update_id",
+            postgresql_where=text("processed_at IS NULL"),
+        ),
+    )
+
+    # Telegram's update_id; a re-delivered update hits the primary key and is ignored
+    update_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    locked_until: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
+    processed_at: Mapped["int | None"] = mapped_column(BigInteger, nullable=True)
+    last_error: Mapped["str | None"] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[created_at]
@@ -6,6 +6,7 @@ class Member(Base):
     __tablename__ = "members"
     
     id: Mapped[UUIDpk]
+    tg_user_id: Mapped[int] = mapped_column(BigInteger, unique=True, nullable=False)
     user_name: Mapped[str] = mapped_column(String(32), nullable=False) 
     first_name: Mapped[str] = mapped_column(String(32), nullable=False)
     last_name: Mapped[str] = mapped_column(String(32), nullable=False)
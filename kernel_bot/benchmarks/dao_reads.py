@@ -0,0 +1,80 @@
+"""
+Member reads, ORM against Core ([db] dao = "orm" / "core"): wall time and
+process CPU time per call, and the peak of Python allocations (tracemalloc)
+over a batch. Every call gets its own session, as one update does. Needs the
+Postgres from .env with the schema applied; a member far outside the real id
+range is created and removed again. From kernel_bot/:
+
+    uv run python -m benchmarks.dao_reads [calls]
+"""
+from __future__ import annotations
+import asyncio
+import sys
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import delete
+
+from src.services.db.core_dao import CoreMemberDAO
+from src.services.db.data_access_module import MemberDAO
+from src.services.db.database import DataBase
+from src.services.db.models import Member
+
+
+TG_ID = 9_100_000_000_000
+
+
+async def main(calls: int) -> None:
+    db = DataBase()
+    await db.init_alchemy_engine()
+    session_factory: Any = db.async_session
+
+    async def cleanup() -> None:
+        async with session_factory() as session:
+            await session.execute(delete(Member).where(Member.tg_user_id == TG_ID))
+            await session.commit()
+
+    async def per_call(read: Callable[[Any], Awaitable[Any]]) -> None:
+        async with session_factory() as session:
+            assert await read(session) is not None
+
+    async def measure(label: str, read: Callable[[Any], Awaitable[Any]]) -> None:
+        for _ in range(50):  # compiled cache and asyncpg statement cache
+            await per_call(read)
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        for _ in range(calls):
+            await per_call(read)
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+
+        tracemalloc.start()
+        for _ in range(min(calls, 500)):
+            await per_call(read)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(
+            f"  {label:<26} {wall / calls * 1e6:8.1f} us wall  {cpu / calls * 1e6:8.1f} us cpu  "
+            f"{peak / 1024:8.1f} KiB peak"
+        )
+
+    await cleanup()
+    async with session_factory() as session:
+        await MemberDAO.create(session, tg_user_id=TG_ID, user_name="dao_reads_bench", first_name="Bench", last_name="")
+        await session.commit()
+
+    print(f"{calls} calls each, one session per call")
+    try:
+        for name, orm, core in (
+            ("get_by_tg_user_id", lambda s: MemberDAO.get_by_tg_user_id(s, TG_ID), lambda s: CoreMemberDAO.get_by_tg_user_id(s, TG_ID)),
+            ("get_by_username", lambda s: MemberDAO.get_by_username(s, "dao_reads_bench"), lambda s: CoreMemberDAO.get_by_username(s, "dao_reads_bench")),
+        ):
+            await measure(f"{name} orm", orm)
+            await measure(f"{name} core", core)
+    finally:
+        await cleanup()
+        await db.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
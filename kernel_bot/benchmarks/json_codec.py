@@ -0,0 +1,128 @@
+"""
+JSON backends on Telegram update payloads: decode, encode, and decode followed
+by aiogram's Update validation (what a getUpdates response or an inbox row
+costs). Uses the recorded payloads from a JSON-lines file when one is given,
+e.g. exported with
+
+    psql -Atc "SELECT payload FROM update_inbox ORDER BY update_id DESC LIMIT 5000" > updates.jsonl
+
+otherwise a built-in mix of message, callback, join request and member
+updates. Backends that are not installed are skipped. From kernel_bot/:
+
+    uv run python -m benchmarks.json_codec [updates.jsonl] [rounds]
+"""
+from __future__ import annotations
+import json
+import sys
+import time
+from typing import Any
+
+from aiogram.types import Update
+
+from src.core import json_codec
+
+
+USER = {"id": 5512345678, "is_bot": False, "first_name": "Анна", "last_name": "Петрова", "username": "anna_p", "language_code": "ru"}
+CHAT = {"id": -1001987654321, "title": "Сообщество", "type": "supergroup"}
+
+
+def sample_updates() -> list[dict[str, Any]]:
+    updates: list[dict[str, Any]] = []
+    for i in range(250):
+        private = {"id": USER["id"], "first_name": USER["first_name"], "username": USER["username"], "type": "private"}
+        updates.append({
+            "update_id": 4 * i,
+            "message": {
+                "message_id": 1000 + i,
+                "from": USER,
+                "chat": private,
+                "date": 1760000000 + i,
+                "text": "/start ref_" + "x" * 12 if i % 5 == 0 else "Здравствуйте! Хочу вступить в сообщество.",
+                "entities": [{"offset": 0, "length": 6, "type": "bot_command"}] if i % 5 == 0 else [],
+            },
+        })
+        updates.append({
+            "update_id": 4 * i + 1,
+            "callback_query": {
+                "id": str(7000000000000 + i),
+                "from": USER,
+                "chat_instance": "-8123456789012345678",
+                "data": f"menu:profile:{i}",
+                "message": {
+                    "message_id": 2000 + i,
+                    "from": {"id": 7000000001, "is_bot": True, "first_name": "Kernel", "username": "kernel_bot"},
+                    "chat": private,
+                    "date": 1760000000 + i,
+                    "text": "Главное меню",
+                    "reply_markup": {"inline_keyboard": [
+                        [{"text": "Профиль", "callback_data": "menu:profile"}],
+                        [{"text": "Пригласить", "callback_data": "menu:invite"}],
+                    ]},
+                },
+            },
+        })
+        updates.append({
+            "update_id": 4 * i + 2,
+            "chat_join_request": {
+                "chat": CHAT,
+                "from": USER,
+                "user_chat_id": USER["id"],
+                "date": 1760000000 + i,
+                "invite_link": {
+                    "invite_link": "https://t.me/+AbCdEfGhIjKlMnOp",
+                    "creator": {"id": 7000000001, "is_bot": True, "first_name": "Kernel"},
+                    "creates_join_request": True,
+                    "is_primary": False,
+                    "is_revoked": False,
+                },
+            },
+        })
+        updates.append({
+            "update_id": 4 * i + 3,
+            "chat_member": {
+                "chat": CHAT,
+                "from": USER,
+                "date": 1760000000 + i,
+                "old_chat_member": {"status": "left", "user": USER},
+                "new_chat_member": {"status": "member", "user": USER},
+            },
+        })
+    return updates
+
+
+def recorded_updates(path: str) -> list[dict[str, Any]]:
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def timed(fn: Any, items: list[Any], rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for item in items:
+            fn(item)
+    return (time.perf_counter() - started) / (rounds * len(items))
+
+
+def main() -> None:
+    path = sys.argv[1] if len(sys.argv) > 1 else None
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    updates = recorded_updates(path) if path else sample_updates()
+    encoded = [json.dumps(u, ensure_ascii=False) for u in updates]
+    size = sum(len(e.encode()) for e in encoded) / len(encoded)
+    print(f"{len(updates)} updates ({path or 'built-in sample'}), {size:.0f} bytes on average, {rounds} rounds")
+
+    for name in json_codec.BACKENDS:
+        if json_codec.use(name) != name:
+            print(f"  {name:<8} not installed")
+            continue
+        loads = timed(json_codec.loads, encoded, rounds)
+        dumps = timed(json_codec.dumps, updates, rounds)
+        validated = timed(lambda raw: Update.model_validate(json_codec.loads(raw)), encoded, rounds)
+        print(
+            f"  {name:<8} loads {loads * 1e6:6.2f} us   dumps {dumps * 1e6:6.2f} us   "
+            f"loads+Update {validated * 1e6:6.2f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Event-loop time spent in logging calls: sinks written synchronously on the loop
+against the queued mode where a background thread does the formatting and I/O.
+Both loguru calls and stdlib records (routed through InterceptHandler) are
+measured; sinks write to a temp dir and /dev/null. From kernel_bot/:
+
+    uv run python -m benchmarks.logging_overhead [records]
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from loguru import logger
+
+from src.core.logging import LogSetup
+
+
+async def emit(n: int) -> tuple[float, float]:
+    stdlib = logging.getLogger("aiogram.event")
+    started = time.perf_counter()
+    for i in range(n):
+        logger.info(f"Update id={i} is handled. Duration 3 ms by bot id=42")
+    loguru_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(n):
+        stdlib.info("Update id=%d is handled. Duration %d ms by bot id=%d", i, 3, 42)
+    stdlib_time = time.perf_counter() - started
+    return loguru_time, stdlib_time
+
+
+def run(n: int, *, queued: bool) -> tuple[float, float, float]:
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull:
+        LogSetup.configure(queued=queued, path=os.path.join(tmp, "debug.json"), stream=devnull)
+        loguru_time, stdlib_time = asyncio.run(emit(n))
+        started = time.perf_counter()
+        LogSetup.shutdown()
+        logger.remove()
+        drain = time.perf_counter() - started
+    return loguru_time, stdlib_time, drain
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    print(f"{n} records per source, time spent on the event loop")
+    for queued in (False, True):
+        loguru_time, stdlib_time, drain = run(n, queued=queued)
+        mode = "queued" if queued else "sync"
+        print(
+            f"  {mode:<7} loguru {loguru_time / n * 1e6:7.2f} us/record   "
+            f"stdlib {stdlib_time / n * 1e6:7.2f} us/record   "
+            f"(writer drained in {drain:.2f}s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
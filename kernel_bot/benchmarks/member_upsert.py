@@ -0,0 +1,103 @@
+"""
+Member upsert: the old SELECT + INSERT/UPDATE + flush path against the single
+INSERT .. ON CONFLICT in MemberDAO.upsert_by_username and MemberDAO.bulk_upsert.
+
+Needs the Postgres from .env with the schema applied. From kernel_bot/:
+
+    uv run python -m benchmarks.member_upsert [rows]
+"""
+from __future__ import annotations
+import asyncio
+import sys
+import time
+from typing import Any
+
+from sqlalchemy import delete, event, select
+
+from src.services.db.data_access_module import MemberDAO
+from src.services.db.database import DataBase
+from src.services.db.models import Member, MemberRole
+
+
+# far outside real telegram ids, removed again at the end
+TG_ID_BASE = 9_000_000_000_000
+
+
+async def legacy_upsert(session: Any, *, tg_user_id: int, user_name: str, first_name: str, last_name: str) -> Member:
+    res = await session.execute(select(Member).where(Member.tg_user_id == tg_user_id))
+    obj = res.scalar_one_or_none()
+    if obj is None:
+        obj = Member(
+            tg_user_id=tg_user_id,
+            user_name=user_name,
+            first_name=first_name,
+            last_name=last_name,
+            role=MemberRole.member,
+            bio="",
+        )
+        session.add(obj)
+    else:
+        obj.first_name = first_name
+        obj.last_name = last_name
+    await session.flush()
+    return obj
+
+
+def _row(i: int, generation: int) -> dict[str, Any]:
+    return {
+        "tg_user_id": TG_ID_BASE + i,
+        "user_name": f"bench{i}",
+        "first_name": f"First{generation}",
+        "last_name": f"Last{generation}",
+    }
+
+
+async def main(rows: int) -> None:
+    db = DataBase()
+    await db.init_alchemy_engine()
+    statements = 0
+
+    @event.listens_for(db.engine.sync_engine, "before_cursor_execute")
+    def _count(*_: Any) -> None:
+        nonlocal statements
+        statements += 1
+
+    async def measure(label: str, body: Any) -> None:
+        nonlocal statements
+        async with db.async_session() as session:
+            statements = 0
+            started = time.perf_counter()
+            await body(session)
+            await session.commit()
+            elapsed = time.perf_counter() - started
+        print(f"{label:<34} {elapsed * 1000:9.1f} ms  {statements:6d} statements")
+
+    async def cleanup() -> None:
+        async with db.async_session() as session:
+            await session.execute(delete(Member).where(Member.tg_user_id >= TG_ID_BASE))
+            await session.commit()
+
+    async def legacy(session: Any, generation: int) -> None:
+        for i in range(rows):
+            await legacy_upsert(session, **_row(i, generation))
+
+    async def single(session: Any, generation: int) -> None:
+        for i in range(rows):
+            await MemberDAO.upsert_by_username(session, **_row(i, generation))
+
+    async def bulk(session: Any, generation: int) -> None:
+        await MemberDAO.bulk_upsert(session, (_row(i, generation) for i in range(rows)))
+
+    print(f"{rows} members")
+    try:
+        for name, body in (("legacy select+insert/update", legacy), ("upsert_by_username", single), ("bulk_upsert", bulk)):
+            await cleanup()
+            await measure(f"{name} (insert)", lambda s: body(s, 0))
+            await measure(f"{name} (update)", lambda s: body(s, 1))
+    finally:
+        await cleanup()
+        await db.engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
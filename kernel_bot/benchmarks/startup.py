@@ -0,0 +1,126 @@
+"""
+Startup cost: how long `import src.bot` takes in a fresh interpreter, and the
+time from spawning `python main.py` to the first handled update. For the
+latter the bot talks to a fake Bot API served here (getUpdates hands out one
+"/help" message, the fallback handler answers it with sendMessage). It needs
+the Postgres from .env with the schema applied, and runs twice: once with an
+empty commands cache and once with a warm one, which skips set_my_commands.
+From kernel_bot/:
+
+    uv run python -m benchmarks.startup [import rounds]
+"""
+from __future__ import annotations
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any
+
+from aiohttp import web
+
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import src.bot; print(time.perf_counter() - t)"
+HELP_UPDATE = {
+    "update_id": 1,
+    "message": {
+        "message_id": 1,
+        "from": {"id": 42, "is_bot": False, "first_name": "Bench"},
+        "chat": {"id": 42, "first_name": "Bench", "type": "private"},
+        "date": 1760000000,
+        "text": "/help",
+        "entities": [{"offset": 0, "length": 5, "type": "bot_command"}],
+    },
+}
+
+
+def import_times(rounds: int) -> list[float]:
+    return [
+        float(subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], check=True, capture_output=True, text=True).stdout)
+        for _ in range(rounds)
+    ]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class FakeBotApi:
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+        self.first_reply = asyncio.get_running_loop().create_future()
+        self.served = False
+        self.app = web.Application()
+        self.app.router.add_post("/bot{token}/{method}", self.handle)
+
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls.append(method)
+        result: Any = True
+        if method == "getMe":
+            result = {"id": 7000000001, "is_bot": True, "first_name": "Kernel", "username": "kernel_bot"}
+        elif method == "getUpdates":
+            if self.served:
+                await asyncio.sleep(1)
+                result = []
+            else:
+                self.served = True
+                result = [HELP_UPDATE]
+        elif method == "sendMessage":
+            if not self.first_reply.done():
+                self.first_reply.set_result(time.perf_counter())
+            result = {"message_id": 2, "date": 1760000000, "chat": HELP_UPDATE["message"]["chat"], "text": "ok"}
+        return web.json_response({"ok": True, "result": result})
+
+
+async def first_update(cache_path: str) -> tuple[float, bool]:
+    api = FakeBotApi()
+    runner = web.AppRunner(api.app)
+    await runner.setup()
+    port = free_port()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    env = {
+        **os.environ,
+        "TELEGRAM_API_SERVER": f"http://127.0.0.1:{port}",
+        "KERNEL_BOT_UPDATE_MODE": "polling",
+        "KERNEL_BOT_PORT": str(free_port()),
+        "KERNEL_BOT__LEADER__ENABLED": "false",
+        "KERNEL_BOT__CONFIG__RELOAD_INTERVAL": "0",
+        "KERNEL_BOT__BOT__COMMANDS_CACHE": cache_path,
+    }
+    started = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, "main.py", env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        replied_at = await asyncio.wait_for(api.first_reply, timeout=60)
+    finally:
+        proc.terminate()
+        await proc.wait()
+        await runner.cleanup()
+    return replied_at - started, "setMyCommands" in api.calls
+
+
+async def first_updates() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "bot_commands.sha256")
+        for label in ("cold commands cache", "warm commands cache"):
+            elapsed, sent = await first_update(cache_path)
+            print(f"  {label}: {elapsed:.2f}s to the first handled update (set_my_commands {'sent' if sent else 'skipped'})")
+
+
+def main() -> None:
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    times = import_times(rounds)
+    print(f"import src.bot: median {statistics.median(times):.3f}s, best {min(times):.3f}s over {rounds} fresh interpreters")
+    asyncio.run(first_updates())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,47 @@
 from __future__ import annotations
 import asyncio
 import sys
+from typing import Callable, Optional
 
 import colorama
 from loguru import logger
 
-from src.core.config import ConfigLoader
+from src.core import json_codec
+from src.core.settings import get_settings
 from src.core.logging import InterceptHandler, LogSetup
 from src.bot import KernelBot
 
 
 class Service:
     def __init__(self):
-        self.config = ConfigLoader()
+        # loads and validates env, .env and pyproject.toml once, fails fast
+        self.settings = get_settings()
+        json_codec.use(self.settings.value("json", "backend"))
         self.intercept_handler = InterceptHandler()
         self.logger_setup = LogSetup()
         self.bot = KernelBot()
-        self.service_name = self.config.get("project", "name")
+        self.service_name = self.settings.value("project", "name")
     
     
+    def _loop_factory(self) -> Optional[Callable[[], asyncio.AbstractEventLoop]]:
+        choice = self.settings.value("bot", "event_loop")
+        if choice == "asyncio":
+            return None
+        try:
+            import uvloop
+        except ImportError:
+            if choice == "uvloop":
+                logger.warning("uvloop is not installed, running on the asyncio event loop")
+            return None
+        return uvloop.new_event_loop
+
+
     def run_service(self):
-        self.logger_setup.configure()
-        asyncio.run(self.bot.run())
+        self.logger_setup.configure(**self.settings.section("logging"))
+        loop_factory = self._loop_factory()
+        logger.info(f"Event loop: {'uvloop' if loop_factory else 'asyncio'}")
+        with asyncio.Runner(loop_factory=loop_factory) as runner:
+            runner.run(self.bot.run())
 
 
 if __name__ == "__main__":
@@ -32,4 +52,7 @@ if __name__ == "__main__":
     except Exception as error:
         logger.critical(f"{colorama.Fore.RED}Service crashed: {error}")
         sys.exit(1)
+    finally:
+        # the records still queued for the log writer thread
+        LogSetup.shutdown()
 
@@ -1,47 +1,474 @@
 from __future__ import annotations
 import asyncio
+import signal
+import time
+from contextlib import suppress
 from dataclasses import dataclass
-from typing import Optional
+from functools import partial
+from typing import Any, Coroutine, Optional
 
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
+from loguru import logger
 
-from src.core.utils import EnvTools
+from src.core import json_codec
+from src.core.config_watcher import Changes, ConfigWatcher, apply_attributes
+from src.core.logging import LogSetup
+from src.core.settings import Settings, get_settings
+from src.core.shutdown import in_flight, shutting_down, until_shutdown
+from src.services.db.data_access_module import use_dao_backend
 from src.services.db.database import DataBase
+from src.services.db.fsm_storage import PostgresStorage
+from src.services.db.leader import LeaderElection
+from src.services.db.member_cache import member_cache
+from src.services.db.member_index import member_index
+from src.services.db import statement_budget
+from src.services.db.update_session import ReleaseConnectionMiddleware
 from src.services.handlers.main_handler import MainHandler, HandlerDeps
+from src.services.inbox.poller import InboxPoller
+from src.services.inbox.workers import InboxWorkers
+from src.services.invites.pool import InvitePoolReplenisher
+from src.services.invites.sweeper import InviteExpirySweeper
+from src.services.metrics.prometheus import (
+    TelegramMetricsMiddleware,
+    instrument_dispatcher,
+    register_member_cache,
+    register_pool,
+)
+from src.services.outbox.sender import OutboxSender
+from src.services.telegram.scheduler import OutboundScheduler
+from src.services.web.server import WebServer
+
+
+ALLOWED_UPDATES = ["message", "callback_query", "inline_query", "chat_join_request", "chat_member"]
+
+
+async def _concurrently(*coros: Coroutine[Any, Any, Any]) -> list[Any]:
+    # gather() that cancels the remaining steps when one of them fails
+    tasks = [asyncio.create_task(c) for c in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
 
 
 class KernelBot:
+    # config keys that are only read when their component is built; a change is
+    # logged and takes effect after a restart
+    RESTART_ONLY: dict[str, tuple[str, ...]] = {
+        "inbox": ("workers",),
+        "outbox": ("concurrency",),
+        "invite_pool": ("concurrency",),
+        "invite_sweeper": ("concurrency",),
+    }
+
+
     def __init__(self) -> None:
-        self.token = EnvTools.required_load_env_var("BOT_TOKEN")
-        self.group_chat_id = int(EnvTools.required_load_env_var("KERNEL_CHAT_ID"))
-        self.admin_user_id = int(EnvTools.required_load_env_var("ADMIN_USER_ID"))
+        settings = get_settings()
+        self.token = settings.bot_token
+        self.group_chat_id = settings.kernel_chat_id
+        self.admin_user_id = settings.admin_user_id
+        self.update_mode = settings.update_mode
+        self.port = settings.port
+        # lets the bot talk to a local (or fake) Bot API server instead of api.telegram.org
+        self.api_server = settings.api_server
         self.db = DataBase()
         self.bot: Optional[Bot] = None
         self.dp: Optional[Dispatcher] = None
+        self.web: Optional[WebServer] = None
+        self.scheduler: Optional[OutboundScheduler] = None
+        self.storage: Optional[PostgresStorage] = None
         self.main_handler = MainHandler()
+        self._background: list[asyncio.Task[None]] = []
+        # loop time by which a requested shutdown stops waiting for work to finish
+        self._drain_deadline: Optional[float] = None
+        # config section -> the running component whose attributes it tunes
+        self._tunables: dict[str, object] = {}
 
 
-    async def _prepare(self) -> None:
+    @property
+    def settings(self) -> Settings:
+        # the settings in effect; a live change that fails to apply puts the previous ones back
+        return get_settings()
+
+
+    def _make_bot(self) -> Bot:
+        # every Bot API response goes through json_loads, so use the fast codec
+        session = AiohttpSession(json_loads=json_codec.loads, json_dumps=json_codec.dumps)
+        if self.api_server:
+            session.api = TelegramAPIServer.from_base(self.api_server, is_local=True)
+        return Bot(token=self.token, session=session)
+
+
+    async def _prepare_db(self) -> None:
+        use_dao_backend(self.settings.value("db", "dao"))
         await self.db.init_alchemy_engine()
+        register_pool(self.db.engine)  # type: ignore[arg-type]
+        register_member_cache(member_cache)
+        statement_budget.install(self.db.engine)  # type: ignore[arg-type]
+        if self.db.replica is not None:
+            statement_budget.install(self.db.replica.engine)
+        member_cache.configure(
+            **self.settings.section("member_cache"),
+            stale_window=self.db.replica.max_lag_seconds if self.db.replica else 0.0,
+        )
+        await member_index.load(self.db.async_session)  # type: ignore[arg-type]
+
+
+    async def _prepare(self) -> None:
+        started = time.perf_counter()
+        self.bot = self._make_bot()
+        self.scheduler = OutboundScheduler(
+            admin_chat_ids=[self.admin_user_id],
+            **self.settings.section("telegram_rate"),
+        )
+        # outermost, so that no update transaction is held while waiting for a send slot
+        self.bot.session.middleware(ReleaseConnectionMiddleware())
+        self.bot.session.middleware(self.scheduler)
+        self.bot.session.middleware(TelegramMetricsMiddleware())
+
+        # the database and the Bot API do not depend on each other
+        await _concurrently(
+            self._prepare_db(),
+            self.main_handler.setup_bot_commands(
+                self.bot,
+                cache_path=self.settings.value("bot", "commands_cache"),
+            ),
+        )
 
-        self.bot = Bot(token=self.token)
+        self.storage = PostgresStorage(
+            self.db.async_session,  # type: ignore[arg-type]
+            **self.settings.section("fsm"),
+            # the inbox spreads a chat's updates over processes, see PostgresStorage._flush_loop
+            write_through=self.update_mode in ("inbox", "worker"),
+        )
+        sql_budget = self._tune("sql_budget", statement_budget.StatementBudgetMiddleware(
+            **self.settings.section("sql_budget"),
+        ))
         self.dp = self.main_handler.make_dispatcher(
             deps=HandlerDeps(
                 session_factory=self.db.async_session,  # type: ignore[arg-type]
                 group_chat_id=self.group_chat_id,
                 admin_user_id=self.admin_user_id,
+                invite_min_remaining_seconds=self.settings.value("invite_pool", "min_remaining_seconds"),
+            ),
+            storage=self.storage,
+            instrument=[instrument_dispatcher, partial(statement_budget.instrument_dispatcher, budget=sql_budget)],
+        )
+
+        # /metrics and the health probes are served in every mode and by standby replicas too
+        self.web = WebServer(host="0.0.0.0", port=self.port)
+        self.web.attach_metrics()
+        self.web.attach_health(self.db.health)  # type: ignore[arg-type]
+        if self.update_mode == "webhook":
+            self.web.attach_webhook(
+                dp=self.dp,
+                bot=self.bot,
+                path=self.settings.value("bot", "webhook_path"),
+                secret_token=self.settings.webhook_secret,  # type: ignore[arg-type]
+            )
+        logger.info(f"Prepared in {time.perf_counter() - started:.2f}s")
+
+
+    async def _on_config_change(self, changes: Changes, previous: Settings) -> None:
+        # all or nothing: when a section fails, every section touched so far, the
+        # failing one included, is applied again from the previous settings,
+        # newest first, before the error goes back to the watcher
+        settings = self.settings
+        touched: list[str] = []
+        restart: dict[str, list[str]] = {}
+        try:
+            for name, changed in changes.items():
+                touched.append(name)
+                restart[name] = await self._apply_section(name, changed, settings)
+        except Exception:
+            for name in reversed(touched):
+                section = previous.sections.get(name, {})
+                try:
+                    await self._apply_section(name, {k: section[k] for k in changes[name] if k in section}, previous)
+                except Exception as ex:
+                    logger.opt(exception=ex).critical(f"Could not put back the previous [{name}]")
+            raise
+        for name, keys in restart.items():
+            if keys:
+                logger.warning(f"[{name}] {', '.join(keys)}: takes effect after a restart")
+
+
+    async def _apply_section(self, name: str, changed: dict[str, Any], settings: Settings) -> list[str]:
+        # returns the changed keys that are only read at startup
+        if name == "db":
+            use_dao_backend(settings.value(name, "dao"))
+            if self.db.replica is not None:
+                self.db.replica.max_lag_seconds = settings.value(name, "replica_max_lag_seconds")
+                self.db.replica.check_interval = settings.value(name, "replica_check_interval")
+            await self.db.apply_pool_config(settings)
+        elif name == "telegram_rate" and self.scheduler is not None:
+            self.scheduler.reconfigure(**settings.section(name))
+        elif name == "member_cache":
+            member_cache.configure(**settings.section(name), stale_window=member_cache.stale_window)
+        elif name == "fsm" and self.storage is not None:
+            self.storage.configure(**settings.section(name))
+        elif name == "shutdown":
+            pass  # read when a stop is requested
+        elif name == "logging":
+            section = settings.section(name)
+            LogSetup.set_levels(**{k: section[k] for k in LogSetup.LIVE_KEYS if k in section})
+            return [k for k in changed if k not in LogSetup.LIVE_KEYS]
+        elif name in self._tunables:
+            return apply_attributes(self._tunables[name], changed, self.RESTART_ONLY.get(name, ()))
+        else:
+            return list(changed)
+        return []
+
+
+    def _tune(self, section: str, component: Any) -> Any:
+        self._tunables[section] = component
+        return component
+
+
+    def _start_background(self, coro: Coroutine[Any, Any, None], name: str) -> None:
+        task = asyncio.create_task(coro, name=name)
+        task.add_done_callback(self._on_background_done)
+        self._background.append(task)
+
+
+    @staticmethod
+    def _on_background_done(task: asyncio.Task[None]) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.opt(exception=task.exception()).critical(f"Background task {task.get_name()} crashed")
+
+
+    def _request_stop(self, sig: signal.Signals, main: asyncio.Task[Any]) -> None:
+        if shutting_down.is_set():
+            logger.warning(f"{sig.name} received again, stopping without waiting")
+            # the teardown still runs, with no time left for the drain
+            self._drain_deadline = asyncio.get_running_loop().time()
+            main.cancel()
+            return
+        drain_timeout = self.settings.value("shutdown", "drain_timeout")
+        logger.info(f"{sig.name} received, finishing in-flight work for up to {drain_timeout}s")
+        self._drain_deadline = asyncio.get_running_loop().time() + drain_timeout
+        shutting_down.set()
+        if self.web is not None:
+            self.web.draining = True
+
+
+    def _remaining(self) -> float:
+        if self._drain_deadline is None:
+            return 0.0
+        return max(self._drain_deadline - asyncio.get_running_loop().time(), 0.0)
+
+
+    async def _drain(self) -> None:
+        if shutting_down.is_set() and not await in_flight.wait_idle(self._remaining()):
+            logger.warning(f"{in_flight.count} updates still in flight at the drain deadline")
+
+
+    async def _stop_background(self) -> None:
+        # on shutdown the loops return by themselves after their current batch
+        if shutting_down.is_set() and self._background:
+            _, pending = await asyncio.wait(self._background, timeout=self._remaining())
+            if pending:
+                logger.warning(f"Cancelling {', '.join(t.get_name() for t in pending)} at the drain deadline")
+        for task in self._background:
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+        self._background.clear()
+
+
+    async def _run_polling(self) -> None:
+        assert self.bot and self.dp
+        # getUpdates is refused by Telegram while a webhook is registered
+        await self.bot.delete_webhook(drop_pending_updates=False)
+        if shutting_down.is_set():
+            return
+        stopper = asyncio.create_task(self._stop_polling_on_shutdown(), name="polling-stopper")
+        try:
+            # the session outlives a lost leadership, a standby may poll again later;
+            # signals are handled by run()
+            await self.dp.start_polling(
+                self.bot,
+                allowed_updates=ALLOWED_UPDATES,
+                close_bot_session=False,
+                handle_signals=False,
             )
+        finally:
+            stopper.cancel()
+
+
+    async def _stop_polling_on_shutdown(self) -> None:
+        assert self.dp
+        await shutting_down.wait()
+        # ends the getUpdates loop; handlers already started keep running
+        await self.dp.stop_polling()
+
+
+    async def _run_webhook(self) -> None:
+        # the route itself is attached to the web server in _prepare
+        assert self.bot
+        base_url = self.settings.webhook_base_url
+        secret_token = self.settings.webhook_secret
+        path = self.settings.value("bot", "webhook_path")
+
+        await self.bot.set_webhook(
+            url=f"{base_url}{path}",
+            secret_token=secret_token,
+            allowed_updates=ALLOWED_UPDATES,
         )
-        await self.main_handler.setup_bot_commands(self.bot)
+        logger.info(f"Webhook registered at {base_url}{path}")
+        # from now on the web server answers webhook calls with 503
+        await shutting_down.wait()
 
 
-    async def run(self) -> None:
-        await self._prepare()
+    async def _run_inbox(self, *, ingest: bool) -> None:
+        # "inbox" polls Telegram into the update_inbox table and processes it,
+        # "worker" only processes; run as many worker replicas as needed
         assert self.bot and self.dp
-        await self.dp.start_polling(
+        workers = self._tune("inbox", InboxWorkers(
+            self.db.async_session,  # type: ignore[arg-type]
             self.bot,
-            allowed_updates=["message", "callback_query", "chat_join_request", "chat_member"],
+            self.dp,
+            **self.settings.section("inbox"),
+        ))
+        jobs: list[Coroutine[Any, Any, Any]] = [workers.run()]
+        if ingest:
+            await self.bot.delete_webhook(drop_pending_updates=False)
+            # a getUpdates cut short is not confirmed, Telegram sends those updates again
+            jobs.append(until_shutdown(
+                InboxPoller(
+                    self.db.async_session,  # type: ignore[arg-type]
+                    self.bot,
+                    allowed_updates=ALLOWED_UPDATES,
+                ).run()
+            ))
+
+        await self.dp.emit_startup(bot=self.bot)
+        try:
+            await asyncio.gather(*jobs)
+        finally:
+            await self.dp.emit_shutdown(bot=self.bot)
+
+
+    async def _lead(self) -> None:
+        assert self.bot
+        self._start_background(
+            self._tune("outbox", OutboxSender(
+                self.db.async_session,  # type: ignore[arg-type]
+                self.bot,
+                **self.settings.section("outbox"),
+            )).run(),
+            name="outbox-sender",
+        )
+        self._start_background(
+            self._tune("invite_pool", InvitePoolReplenisher(
+                self.db.async_session,  # type: ignore[arg-type]
+                self.bot,
+                chat_id=self.group_chat_id,
+                **self.settings.section("invite_pool"),
+            )).run(),
+            name="invite-pool",
         )
+        self._start_background(
+            self._tune("invite_sweeper", InviteExpirySweeper(
+                self.db.async_session,  # type: ignore[arg-type]
+                self.bot,
+                **self.settings.section("invite_sweeper"),
+            )).run(),
+            name="invite-sweeper",
+        )
+        try:
+            if self.update_mode == "webhook":
+                await self._run_webhook()
+            elif self.update_mode == "polling":
+                await self._run_polling()
+            elif self.update_mode == "inbox":
+                await self._run_inbox(ingest=True)
+            else:
+                raise RuntimeError(f"Unknown update mode: {self.update_mode}")
+        finally:
+            # the background loops are stopped even when the drain is cut short
+            try:
+                await self._drain()
+            finally:
+                await self._stop_background()
+
+
+    async def _run_elected(self) -> None:
+        election = LeaderElection(
+            self.db.engine,  # type: ignore[arg-type]
+            **{k: v for k, v in self.settings.section("leader").items() if k != "enabled"},
+        )
+        try:
+            while not shutting_down.is_set():
+                await until_shutdown(election.acquire())
+                if shutting_down.is_set():
+                    return
+                logger.info("This replica is the leader now")
+                lead = asyncio.create_task(self._lead(), name="leader")
+                watch = asyncio.create_task(election.watch(), name="leader-watch")
+                try:
+                    await asyncio.wait({lead, watch}, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    # also when this task is cancelled: _lead stops its background loops
+                    lead.cancel()
+                    watch.cancel()
+                    await asyncio.gather(lead, watch, return_exceptions=True)
+                if not lead.cancelled():
+                    lead.result()  # stopped on its own or crashed
+                    return
+                logger.warning("Leadership lost, standing by")
+        finally:
+            await election.release()
+
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        main = asyncio.current_task()
+        assert main
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            with suppress(NotImplementedError):  # no signal handlers on Windows
+                loop.add_signal_handler(sig, self._request_stop, sig, main)
 
+        watcher: Optional[asyncio.Task[None]] = None
+        try:
+            await self._prepare()
+            assert self.web
+            await self.web.start()
+            reload_interval = self.settings.value("config", "reload_interval")
+            if reload_interval > 0:
+                watcher = asyncio.create_task(
+                    ConfigWatcher(self._on_config_change, interval=reload_interval).run(),
+                    name="config-watcher",
+                )
 
+            if self.update_mode == "worker":
+                # workers share the inbox through SKIP LOCKED and need no leader
+                await self._run_inbox(ingest=False)
+            elif self.settings.value("leader", "enabled"):
+                await self._run_elected()
+            else:
+                await self._lead()
+        finally:
+            # intake has stopped and in-flight work is done (or out of time) by now;
+            # close everything that still holds buffered writes or connections
+            if watcher is not None:
+                watcher.cancel()
+                await asyncio.gather(watcher, return_exceptions=True)
+            if self.web is not None:
+                await self.web.stop()
+            if self.storage is not None:
+                await self.storage.close()
+            if self.scheduler is not None:
+                await self.scheduler.close()
+            await self.db.dispose()
+            if self.bot is not None:
+                await self.bot.session.close()
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                with suppress(NotImplementedError):
+                    loop.remove_signal_handler(sig)
+            logger.info("Shutdown complete")
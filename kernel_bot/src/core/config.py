@@ -1,14 +1,38 @@
 from __future__ import annotations
 
+import os
 import tomllib
 from typing import Any, ClassVar
 
 import colorama# type: ignore[import-untyped]
+from dotenv import dotenv_values, find_dotenv
 from loguru import logger
 
 from src.core.utils import EnvTools, MethodTools
 
 
+# Layers, later ones win: pyproject.toml, the override file, then env vars named
+# KERNEL_BOT__<SECTION>__<KEY> (values are parsed as TOML, e.g. 20 or "INFO").
+OVERRIDE_FILE_ENV = "KERNEL_BOT_CONFIG_OVERRIDE"
+DEFAULT_OVERRIDE_FILE = "config.override.toml"
+ENV_PREFIX = "KERNEL_BOT__"
+
+
+def _merge(base: dict[str, Any], layer: dict[str, Any]) -> None:
+    for key, value in layer.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            _merge(base[key], value)
+        else:
+            base[key] = value
+
+
+def _parse_value(raw: str) -> Any:
+    try:
+        return tomllib.loads(f"v = {raw}")["v"]
+    except tomllib.TOMLDecodeError:
+        return raw
+
+
 class ConfigLoader:
     __instance: ClassVar[ConfigLoader | None] = None
     __config: ClassVar[dict[str, Any]] = {}
@@ -24,14 +48,67 @@ class ConfigLoader:
     @classmethod
     def _load(cls) -> None:
         try:
-            with open("pyproject.toml", "rb") as f:
-                cls.__config = tomllib.load(f)
+            cls.__config = cls._read()
             EnvTools.set_env_var("CONFIG_LOADED", "1")
         except Exception as error:
             logger.critical("Config load failed: {error}", error=error)
             raise
 
 
+    @classmethod
+    def reload(cls) -> dict[str, Any]:
+        # the current config stays in place if any layer fails to parse; returns
+        # the replaced one for restore()
+        previous = cls.__config
+        cls.__config = cls._read()
+        return previous
+
+
+    @classmethod
+    def restore(cls, config: dict[str, Any]) -> None:
+        cls.__config = config
+
+
+    @classmethod
+    def _read(cls) -> dict[str, Any]:
+        with open("pyproject.toml", "rb") as f:
+            config = tomllib.load(f)
+        override = cls.override_file()
+        if os.path.exists(override):
+            with open(override, "rb") as f:
+                _merge(config, tomllib.load(f))
+        _merge(config, cls._env_layer())
+        return config
+
+
+    @staticmethod
+    def override_file() -> str:
+        return os.environ.get(OVERRIDE_FILE_ENV) or DEFAULT_OVERRIDE_FILE
+
+
+    @classmethod
+    def watched_files(cls) -> list[str]:
+        return ["pyproject.toml", cls.override_file()]
+
+
+    @staticmethod
+    def _env_layer() -> dict[str, Any]:
+        dotenv_path = find_dotenv(usecwd=True)
+        env = {k: v for k, v in dotenv_values(dotenv_path).items() if v is not None} if dotenv_path else {}
+        env.update(os.environ)
+
+        layer: dict[str, Any] = {}
+        for name, raw in env.items():
+            if not name.startswith(ENV_PREFIX):
+                continue
+            *path, key = name[len(ENV_PREFIX):].lower().split("__")
+            node = layer
+            for part in path:
+                node = node.setdefault(part, {})
+            node[key] = _parse_value(raw)
+        return layer
+
+
     @classmethod
     def get(cls, section: str, key: str = "") -> Any:
         try:
@@ -46,5 +123,10 @@ class ConfigLoader:
             raise
 
 
+    @classmethod
+    def sections(cls) -> list[str]:
+        return list(cls.__config)
+
+
     def __getitem__(self, section: str) -> Any:
         return type(self).get(section)
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Collection, Mapping, Optional
+
+from loguru import logger
+
+from src.core.config import ConfigLoader
+from src.core.settings import Settings, get_settings, reload_settings, restore_settings
+
+
+Changes = dict[str, dict[str, Any]]
+
+
+def _diff(old: Mapping[str, Any], new: Mapping[str, Any]) -> dict[str, Any]:
+    # a removed key shows up with None
+    return {k: new.get(k) for k in {**old, **new} if old.get(k) != new.get(k)}
+
+
+def apply_attributes(
+    target: object,
+    changes: Mapping[str, Any],
+    restart_only: Collection[str] = (),
+) -> list[str]:
+    # sets the attributes named like the changed keys; keys in restart_only are
+    # only read when `target` is built and are returned instead
+    skipped = [key for key in changes if key in restart_only]
+    for key, value in changes.items():
+        if key in restart_only:
+            continue
+        if key.startswith("_") or not hasattr(target, key):
+            raise AttributeError(f"{type(target).__name__} has no live setting {key!r}")
+        setattr(target, key, value)
+    return skipped
+
+
+class ConfigWatcher:
+    # Polls the mtimes of the config files and, after a successful reload,
+    # passes {section: {changed key: new value}} and the previous settings to
+    # `on_change`. on_change applies all of it or none: before raising it puts
+    # back whatever it had applied. The previous settings and config layers are
+    # then restored and the reload is tried again on the next tick.
+
+    def __init__(
+        self,
+        on_change: Callable[[Changes, Settings], Awaitable[None]],
+        *,
+        interval: float = 5.0,
+    ) -> None:
+        self.on_change = on_change
+        self.interval = interval
+
+
+    @staticmethod
+    def _stamp() -> tuple[tuple[str, Optional[int]], ...]:
+        stamp = []
+        for path in ConfigLoader.watched_files():
+            try:
+                stamp.append((path, os.stat(path).st_mtime_ns))
+            except FileNotFoundError:
+                stamp.append((path, None))
+        return tuple(stamp)
+
+
+    async def run(self) -> None:
+        stamp = self._stamp()
+        while True:
+            await asyncio.sleep(self.interval)
+            current = self._stamp()
+            if current == stamp:
+                continue
+            if await self.reload():
+                stamp = current
+
+
+    async def reload(self) -> bool:
+        # False when the new config could not be applied and should be tried again
+        old = get_settings()
+        try:
+            new = reload_settings()
+        except Exception as ex:
+            logger.error(f"Config reload failed, keeping the current config: {ex}")
+            # a broken file stays broken until it is saved again
+            return True
+
+        changes: Changes = {}
+        for name in {**old.sections, **new.sections}:
+            diff = _diff(old.sections.get(name, {}), new.sections.get(name, {}))
+            if diff:
+                changes[name] = diff
+        if not changes:
+            return True
+        logger.info(f"Config changed: {', '.join(f'[{name}] ' + ', '.join(keys) for name, keys in changes.items())}")
+        try:
+            await self.on_change(changes, old)
+        except Exception as ex:
+            logger.opt(exception=ex).error("Applying the new config failed, keeping the current config")
+            restore_settings(old)
+            return False
+        return True
@@ -0,0 +1,107 @@
+from __future__ import annotations
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from loguru import logger
+
+
+# orjson and msgspec are optional (pip install kernel-bot[speedups]); every
+# backend returns str from dumps() and raises ValueError from loads(), so the
+# callers do not care which one is active.
+BACKENDS = ("orjson", "msgspec", "json")
+
+Default = Optional[Callable[[Any], Any]]
+
+
+@dataclass(frozen=True, slots=True)
+class _Backend:
+    name: str
+    loads: Callable[[str | bytes], Any]
+    dumps: Callable[[Any, Default], str]
+    dumps_pretty: Callable[[Any], str]
+
+
+def _dumps_pretty(obj: Any) -> str:
+    # not a hot path (JsonLoader.write_json); the same 4 space layout whatever the backend
+    return json.dumps(obj, ensure_ascii=False, indent=4)
+
+
+def _stdlib() -> _Backend:
+    return _Backend(
+        name="json",
+        loads=json.loads,
+        dumps=lambda obj, default=None: json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=default),
+        dumps_pretty=_dumps_pretty,
+    )
+
+
+def _orjson() -> _Backend:
+    import orjson
+
+    option = orjson.OPT_NON_STR_KEYS
+    return _Backend(
+        name="orjson",
+        # orjson.JSONDecodeError is a json.JSONDecodeError
+        loads=orjson.loads,
+        dumps=lambda obj, default=None: orjson.dumps(obj, default=default, option=option).decode(),
+        dumps_pretty=_dumps_pretty,
+    )
+
+
+def _msgspec() -> _Backend:
+    import msgspec
+
+    decode = msgspec.json.decode
+    encode = msgspec.json.encode
+
+    def loads(data: str | bytes) -> Any:
+        try:
+            return decode(data)
+        except msgspec.DecodeError as ex:
+            raise ValueError(str(ex)) from ex
+
+    return _Backend(
+        name="msgspec",
+        loads=loads,
+        dumps=lambda obj, default=None: encode(obj, enc_hook=default).decode(),
+        dumps_pretty=_dumps_pretty,
+    )
+
+
+_FACTORIES: dict[str, Callable[[], _Backend]] = {"orjson": _orjson, "msgspec": _msgspec, "json": _stdlib}
+_active = _stdlib()
+
+
+def use(name: str = "auto") -> str:
+    # "auto" takes the first backend that imports
+    global _active
+    if name != "auto" and name not in _FACTORIES:
+        raise ValueError(f"Unknown JSON backend {name!r}, expected auto or one of {', '.join(BACKENDS)}")
+    for candidate in BACKENDS if name == "auto" else (name,):
+        try:
+            _active = _FACTORIES[candidate]()
+            break
+        except ImportError:
+            if name != "auto":
+                logger.warning(f"JSON backend {name} is not installed, using the standard library")
+                _active = _stdlib()
+    logger.debug(f"JSON backend: {_active.name}")
+    return _active.name
+
+
+def backend() -> str:
+    return _active.name
+
+
+def loads(data: str | bytes) -> Any:
+    return _active.loads(data)
+
+
+def dumps(obj: Any, default: Default = None) -> str:
+    # compact; `default` is called for objects the encoder does not know
+    return _active.dumps(obj, default)
+
+
+def dumps_pretty(obj: Any) -> str:
+    return _active.dumps_pretty(obj)
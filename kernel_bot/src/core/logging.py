@@ -1,48 +1,269 @@
-import inspect
+import atexit
+import copy
 import logging
+import queue
+import random
 import sys
+import threading
+import traceback
+from typing import Any, ClassVar, Optional, TextIO
 
 from loguru import logger
 
+from src.core import json_codec
+
+
+_STDLIB_LEVELS = {
+    logging.CRITICAL: "CRITICAL",
+    logging.ERROR: "ERROR",
+    logging.WARNING: "WARNING",
+    logging.INFO: "INFO",
+    logging.DEBUG: "DEBUG",
+}
+_caller = threading.local()
+
+
+def _stdlib_caller(record: Any) -> None:
+    # the LogRecord already knows its caller, no need to walk the stack for it
+    src: Optional[logging.LogRecord] = getattr(_caller, "record", None)
+    if src is not None:
+        record["name"] = src.name
+        record["function"] = src.funcName
+        record["line"] = src.lineno
+        record["module"] = src.module
+
+
+_stdlib_logger = logger.patch(_stdlib_caller)
+
 
 class InterceptHandler(logging.Handler):
     def emit(self, record: logging.LogRecord) -> None:
-        log_level: int
+        level: Any = _STDLIB_LEVELS.get(record.levelno, record.levelno)
+        _caller.record = record
         try:
-            log_level = logger.level(record.levelname).no
-        except ValueError:
-            log_level = record.levelno
-
-        frame, depth = inspect.currentframe(), 0
-        while frame and depth < 10:
-            if frame.f_code.co_filename == logging.__file__:
-                depth += 1
-            frame = frame.f_back
-
-        logger.opt(depth=depth, exception=record.exc_info, record=True).log(
-            log_level, record.getMessage()
-        )
+            _stdlib_logger.opt(exception=record.exc_info).log(level, record.getMessage())
+        finally:
+            _caller.record = None
+
+
+def _serialize(record: Any) -> str:
+    # the layout of loguru's serialize=True, encoded with the configured JSON backend
+    text = f"{record['time'].isoformat()} {record['level'].name} {record['message']}\n"
+    exception = record["exception"]
+    if exception is not None:
+        text += "".join(traceback.format_exception(exception.type, exception.value, exception.traceback))
+        exception = {
+            "type": None if exception.type is None else exception.type.__name__,
+            "value": None if exception.value is None else str(exception.value),
+            "traceback": bool(exception.traceback),
+        }
+    return json_codec.dumps(
+        {
+            "text": text,
+            "record": {
+                "elapsed": {"repr": str(record["elapsed"]), "seconds": record["elapsed"].total_seconds()},
+                "exception": exception,
+                "extra": {k: v for k, v in record["extra"].items() if k != "serialized"},
+                "file": {"name": record["file"].name, "path": record["file"].path},
+                "function": record["function"],
+                "level": {"icon": record["level"].icon, "name": record["level"].name, "no": record["level"].no},
+                "line": record["line"],
+                "message": record["message"],
+                "module": record["module"],
+                "name": record["name"],
+                "process": {"id": record["process"].id, "name": record["process"].name},
+                "thread": {"id": record["thread"].id, "name": record["thread"].name},
+                "time": {"repr": str(record["time"]), "timestamp": record["time"].timestamp()},
+            },
+        },
+        default=str,
+    )
+
+
+def _json_format(record: Any) -> str:
+    record["extra"]["serialized"] = _serialize(record)
+    return "{extra[serialized]}\n"
+
+
+# fields of a record that are copied over when the writer thread re-emits it
+_RECORD_FIELDS = ("time", "elapsed", "name", "function", "line", "module", "file", "extra", "exception", "process", "thread")
+
+
+class QueuedSink:
+    # loguru sink that only puts the record on a bounded queue; a daemon thread
+    # re-emits it through a private logger that owns the real (slow) sinks. When
+    # the queue is full records are dropped and counted, the event loop never waits.
+
+    def __init__(self, writer: Any, *, maxsize: int = 10_000) -> None:
+        self._queue: queue.Queue[Any] = queue.Queue(maxsize)
+        self._current: dict[str, Any] = {}
+        self._writer = writer.patch(self._restore)
+        self._raw_writer = writer
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+
+    def __call__(self, message: Any) -> None:
+        try:
+            self._queue.put_nowait(message.record)
+        except queue.Full:
+            self.dropped += 1
+
+
+    def _restore(self, record: Any) -> None:
+        for key in _RECORD_FIELDS:
+            record[key] = self._current[key]
+
+
+    def _run(self) -> None:
+        reported = 0
+        while True:
+            record = self._queue.get()
+            if record is None:
+                return
+            self._current = record
+            self._writer.log(record["level"].name, record["message"])
+            if self.dropped != reported and self._queue.empty():
+                self._raw_writer.warning(f"Log queue was full, {self.dropped - reported} records dropped")
+                reported = self.dropped
+
+
+    def close(self, timeout: float = 5.0) -> None:
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
 
 
 class LogSetup:
+    # Sinks are added at TRACE and filter on these thresholds, so set_levels()
+    # can change them while the service runs. Per-logger levels and sampling
+    # rates are applied before a record is queued.
+    LIVE_KEYS: ClassVar[tuple[str, ...]] = ("level", "file_level", "modules", "sampling")
+
+    _sink_levels: ClassVar[dict[str, int]] = {"stdout": 10, "file": 10}
+    _module_levels: ClassVar[dict[str, int]] = {}
+    _sampling: ClassVar[dict[str, dict[int, float]]] = {}
+    _queued: ClassVar[Optional[QueuedSink]] = None
+    _atexit_registered: ClassVar[bool] = False
+
+
+    @classmethod
+    def set_levels(
+        cls,
+        *,
+        level: str = "DEBUG",
+        file_level: str = "DEBUG",
+        modules: Optional[dict[str, str]] = None,
+        sampling: Optional[dict[str, dict[str, float]]] = None,
+    ) -> None:
+        cls._sink_levels = {"stdout": logger.level(level).no, "file": logger.level(file_level).no}
+        cls._module_levels = {name: logger.level(lvl).no for name, lvl in (modules or {}).items()}
+        cls._sampling = {
+            name: {logger.level(lvl).no: rate for lvl, rate in rates.items()}
+            for name, rates in (sampling or {}).items()
+        }
+        # stdlib loggers should not even build records nobody will write
+        logging.getLogger().setLevel(min([*cls._sink_levels.values(), *cls._module_levels.values()]))
+
+
     @staticmethod
-    def configure() -> None:
+    def _lookup(table: dict[str, Any], name: Optional[str]) -> Any:
+        # the most specific dotted prefix wins
+        while table and name:
+            found = table.get(name)
+            if found is not None:
+                return found
+            if "." not in name:
+                break
+            name = name.rsplit(".", 1)[0]
+        return None
+
+
+    @classmethod
+    def _threshold(cls, sink: str, name: Optional[str]) -> int:
+        lvl = cls._lookup(cls._module_levels, name)
+        return cls._sink_levels[sink] if lvl is None else lvl
+
+
+    @classmethod
+    def _sampled(cls, record: Any) -> bool:
+        rates = cls._lookup(cls._sampling, record["name"])
+        no = record["level"].no
+        return rates is None or no not in rates or random.random() < rates[no]
+
+
+    @classmethod
+    def _filter(cls, sink: str, *, sample: bool) -> Any:
+        def accept(record: Any) -> bool:
+            if record["level"].no < cls._threshold(sink, record["name"]):
+                return False
+            return not sample or cls._sampled(record)
+        return accept
+
+
+    @classmethod
+    def _admit(cls, record: Any) -> bool:
+        # front filter of the queued mode: drops what no sink would write, then samples
+        no = record["level"].no
+        name = record["name"]
+        if no < min(cls._threshold("stdout", name), cls._threshold("file", name)):
+            return False
+        return cls._sampled(record)
+
+
+    @classmethod
+    def configure(
+        cls,
+        *,
+        queued: bool = True,
+        queue_size: int = 10_000,
+        path: str = "debug/debug.json",
+        stream: TextIO = sys.stdout,
+        **levels: Any,
+    ) -> None:
+        cls.set_levels(**levels)
+        cls.shutdown()
         logger.remove()
-        logger.add(
-            "debug/debug.json",
-            format="{time} {level} {message}",
-            serialize=True,
+
+        # with queued=True the sinks live on a copy of the logger that only the
+        # writer thread uses (the loguru way to get an independent logger)
+        target = copy.deepcopy(logger) if queued else logger
+        target.add(
+            path,
+            format=_json_format,
             rotation="04:00",
             retention="14 days",
             compression="zip",
-            level="DEBUG",
+            level="TRACE",
+            filter=cls._filter("file", sample=not queued),
             catch=True,
         )
 
-        logger.add(
-            sys.stdout,
+        target.add(
+            stream,
             format="<green>{time:HH:mm:ss}</green> | <level>{level: <8}</level> | "
             "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - {message}",
-            level="DEBUG",
+            level="TRACE",
+            filter=cls._filter("stdout", sample=not queued),
             catch=True,
         )
+        if queued:
+            cls._queued = QueuedSink(target, maxsize=queue_size)
+            logger.add(cls._queued, format="{message}", level="TRACE", filter=cls._admit, catch=True)
+            if not cls._atexit_registered:
+                atexit.register(cls.shutdown)
+                cls._atexit_registered = True
+
+        logging.basicConfig(handlers=[InterceptHandler()], force=True)
+
+
+    @classmethod
+    def shutdown(cls) -> None:
+        # flushes whatever is still queued
+        if cls._queued is not None:
+            logger.remove()
+            cls._queued.close()
+            cls._queued = None
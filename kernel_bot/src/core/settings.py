@@ -0,0 +1,347 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Callable, Mapping, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from dotenv import dotenv_values, find_dotenv
+from loguru import logger
+
+from src.core.config import ConfigLoader
+
+
+UPDATE_MODES = ("polling", "webhook", "inbox", "worker")
+
+
+@dataclass(frozen=True, slots=True)
+class PostgresSettings:
+    host: str
+    port: int
+    user: str
+    password: str
+    db: str
+    replica_host: Optional[str]
+    replica_port: int
+
+
+    @property
+    def url(self) -> str:
+        return f"postgresql+asyncpg://{self.user}:{self.password}@{self.host}:{self.port}/{self.db}"
+
+
+    @property
+    def replica_url(self) -> Optional[str]:
+        if not self.replica_host:
+            return None
+        return f"postgresql+asyncpg://{self.user}:{self.password}@{self.replica_host}:{self.replica_port}/{self.db}"
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    tz: ZoneInfo
+    bot_token: str
+    kernel_chat_id: int
+    admin_user_id: int
+    update_mode: str
+    port: int
+    api_server: Optional[str]
+    webhook_base_url: Optional[str]
+    webhook_secret: Optional[str]
+    postgres: PostgresSettings
+    # pyproject.toml sections, read-only
+    sections: Mapping[str, Mapping[str, Any]]
+
+
+    def section(self, name: str) -> dict[str, Any]:
+        # a copy, ready to be passed on as **kwargs
+        return dict(self.sections.get(name, {}))
+
+
+    def value(self, section: str, key: str) -> Any:
+        return self.sections[section][key]
+
+
+class _Reader:
+    # collects every problem instead of stopping at the first one
+    def __init__(self, env: Mapping[str, str]) -> None:
+        self.env = env
+        self.errors: list[str] = []
+
+
+    def optional(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        return self.env.get(name) or default
+
+
+    def required(self, name: str) -> str:
+        value = self.env.get(name)
+        if not value:
+            self.errors.append(f"{name} is not set")
+            return ""
+        return value
+
+
+    def integer(self, name: str, value: Optional[str]) -> int:
+        try:
+            return int(value or "")
+        except ValueError:
+            if value:
+                self.errors.append(f"{name} must be an integer, got {value!r}")
+            return 0
+
+
+Check = Callable[[Any], Optional[str]]
+
+
+def _integer(minimum: int) -> Check:
+    def check(value: Any) -> Optional[str]:
+        if isinstance(value, bool) or not isinstance(value, int):
+            return f"must be an integer, got {value!r}"
+        if value < minimum:
+            return f"must be at least {minimum}, got {value}"
+        return None
+    return check
+
+
+def _number(minimum: float = 0.0, *, positive: bool = False, maximum: Optional[float] = None) -> Check:
+    def check(value: Any) -> Optional[str]:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return f"must be a number, got {value!r}"
+        if positive and value <= 0:
+            return f"must be greater than 0, got {value}"
+        if value < minimum:
+            return f"must be at least {minimum}, got {value}"
+        if maximum is not None and value > maximum:
+            return f"must be at most {maximum}, got {value}"
+        return None
+    return check
+
+
+def _boolean(value: Any) -> Optional[str]:
+    return None if isinstance(value, bool) else f"must be true or false, got {value!r}"
+
+
+def _choice(*options: str) -> Check:
+    def check(value: Any) -> Optional[str]:
+        return None if value in options else f"must be one of {', '.join(options)}, got {value!r}"
+    return check
+
+
+def _level(value: Any) -> Optional[str]:
+    try:
+        logger.level(value)
+    except (TypeError, ValueError):
+        return f"must be a log level name, got {value!r}"
+    return None
+
+
+def _module_levels(value: Any) -> Optional[str]:
+    if not isinstance(value, Mapping):
+        return f"must be a table of logger = level, got {value!r}"
+    for name, lvl in value.items():  # type: ignore[union-attr]
+        error = _level(lvl)
+        if error:
+            return f"{name} {error}"
+    return None
+
+
+def _sampling(value: Any) -> Optional[str]:
+    if not isinstance(value, Mapping):
+        return f"must be a table of logger = {{ LEVEL = rate }}, got {value!r}"
+    share = _number(maximum=1.0)
+    for name, rates in value.items():  # type: ignore[union-attr]
+        if not isinstance(rates, Mapping):
+            return f"{name} must be a table of LEVEL = rate, got {rates!r}"
+        for lvl, rate in rates.items():  # type: ignore[union-attr]
+            error = _level(lvl) or share(rate)
+            if error:
+                return f"{name}.{lvl} {error}"
+    return None
+
+
+# The sections KernelBot applies while running: a bad value has to be refused
+# when the config is read, not when a rate or pool size is already in use.
+LIVE_SECTIONS: dict[str, dict[str, Check]] = {
+    "db": {
+        "echo": _boolean,
+        "pool_size": _integer(1),
+        "max_overflow": _integer(0),
+        "pool_timeout": _number(positive=True),
+        "pool_recycle": _integer(-1),
+        "pre_ping": _boolean,
+        "health_interval": _number(positive=True),
+        "health_timeout": _number(positive=True),
+        "dao": _choice("orm", "core"),
+        "replica_max_lag_seconds": _number(),
+        "replica_check_interval": _number(positive=True),
+    },
+    "logging": {
+        "level": _level,
+        "file_level": _level,
+        "queued": _boolean,
+        "queue_size": _integer(1),
+        "modules": _module_levels,
+        "sampling": _sampling,
+    },
+    "sql_budget": {
+        "max_statements": _integer(0),
+        "repeat_threshold": _integer(2),
+    },
+    "shutdown": {
+        "drain_timeout": _number(),
+    },
+    "fsm": {
+        "ttl_seconds": _number(positive=True),
+        "max_cached": _integer(1),
+        "flush_interval": _number(positive=True),
+        "flush_batch_size": _integer(1),
+    },
+    "member_cache": {
+        "ttl_seconds": _number(),
+        "max_size": _integer(1),
+    },
+    "outbox": {
+        "batch_size": _integer(1),
+        "concurrency": _integer(1),
+        "poll_interval": _number(positive=True),
+        "lease_seconds": _integer(1),
+        "max_attempts": _integer(1),
+        "max_backoff_seconds": _integer(1),
+        "retention_seconds": _integer(1),
+    },
+    "inbox": {
+        "workers": _integer(1),
+        "batch_size": _integer(1),
+        "lease_seconds": _integer(1),
+        "poll_interval": _number(positive=True),
+        "max_attempts": _integer(1),
+        "retention_seconds": _integer(1),
+    },
+    "invite_pool": {
+        "size": _integer(0),
+        "link_ttl_seconds": _integer(60),
+        "min_remaining_seconds": _integer(0),
+        "interval": _number(positive=True),
+        "concurrency": _integer(1),
+    },
+    "invite_sweeper": {
+        "interval": _number(positive=True),
+        "batch_size": _integer(1),
+        "concurrency": _integer(1),
+    },
+    "telegram_rate": {
+        "global_rate": _number(positive=True),
+        "private_chat_rate": _number(positive=True),
+        "group_chat_rate": _number(positive=True),
+        "burst": _number(1.0),
+        "max_retries": _integer(0),
+    },
+}
+
+
+def validate_sections(sections: Mapping[str, Mapping[str, Any]]) -> list[str]:
+    # the live sections are passed on as **kwargs, so unknown keys are errors
+    # too, and so are missing ones: a removed key would have nothing to go back to
+    errors: list[str] = []
+    for name, checks in LIVE_SECTIONS.items():
+        section = sections.get(name, {})
+        errors.extend(f"[{name}] {key} is missing" for key in checks if key not in section)
+        for key, value in section.items():
+            check = checks.get(key)
+            error = "is not a known key" if check is None else check(value)
+            if error:
+                errors.append(f"[{name}] {key} {error}")
+    return errors
+
+
+def _read_env() -> dict[str, str]:
+    # process environment wins over .env, like load_dotenv(override=False)
+    dotenv_path = find_dotenv(usecwd=True)
+    values = {k: v for k, v in dotenv_values(dotenv_path).items() if v is not None} if dotenv_path else {}
+    values.update(os.environ)
+    return values
+
+
+def _tz(name: str) -> ZoneInfo:
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo("UTC")
+
+
+def load_settings() -> Settings:
+    config = ConfigLoader()
+    sections = {name: config.get(name) for name in config.sections()}
+    r = _Reader(_read_env())
+
+    if r.optional("RUNNING_INSIDE_DOCKER") == "1":
+        db_host = f"postgres-{r.required('COMPOSE_PROJECT_NAME')}"
+    else:
+        db_host = r.required("POSTGRES_HOST")
+    db_port = r.integer("POSTGRES_PORT", r.required("POSTGRES_PORT"))
+    postgres = PostgresSettings(
+        host=db_host,
+        port=db_port,
+        user=r.required("POSTGRES_USER"),
+        password=r.required("POSTGRES_PASSWORD"),
+        db=r.required("POSTGRES_DB"),
+        replica_host=r.optional("POSTGRES_REPLICA_HOST"),
+        replica_port=r.integer("POSTGRES_REPLICA_PORT", r.optional("POSTGRES_REPLICA_PORT")) or db_port,
+    )
+
+    update_mode = r.optional("KERNEL_BOT_UPDATE_MODE") or sections.get("bot", {}).get("update_mode", "polling")
+    if update_mode not in UPDATE_MODES:
+        r.errors.append(f"update mode must be one of {', '.join(UPDATE_MODES)}, got {update_mode!r}")
+    webhook_base_url = r.optional("WEBHOOK_BASE_URL")
+    webhook_secret = r.optional("WEBHOOK_SECRET")
+    if update_mode == "webhook" and not (webhook_base_url and webhook_secret):
+        r.errors.append("webhook mode needs WEBHOOK_BASE_URL and WEBHOOK_SECRET")
+    r.errors.extend(validate_sections(sections))
+
+    settings = Settings(
+        tz=_tz(r.optional("TZ", "UTC") or "UTC"),
+        bot_token=r.required("BOT_TOKEN"),
+        kernel_chat_id=r.integer("KERNEL_CHAT_ID", r.required("KERNEL_CHAT_ID")),
+        admin_user_id=r.integer("ADMIN_USER_ID", r.required("ADMIN_USER_ID")),
+        update_mode=update_mode,
+        port=r.integer("KERNEL_BOT_PORT", r.optional("KERNEL_BOT_PORT", "3553")),
+        api_server=r.optional("TELEGRAM_API_SERVER"),
+        webhook_base_url=webhook_base_url.rstrip("/") if webhook_base_url else None,
+        webhook_secret=webhook_secret,
+        postgres=postgres,
+        sections=MappingProxyType({k: MappingProxyType(dict(v)) for k, v in sections.items()}),
+    )
+    if r.errors:
+        raise RuntimeError("Invalid settings:\n  " + "\n  ".join(r.errors))
+    return settings
+
+
+_settings: Optional[Settings] = None
+
+
+def get_settings() -> Settings:
+    global _settings
+    if _settings is None:
+        _settings = load_settings()
+    return _settings
+
+
+def reload_settings() -> Settings:
+    # re-reads every config layer; on any error the previous settings stay in effect
+    global _settings
+    previous = ConfigLoader.reload()
+    try:
+        _settings = load_settings()
+    except Exception:
+        ConfigLoader.restore(previous)
+        raise
+    return _settings
+
+
+def restore_settings(settings: Settings) -> None:
+    # puts back the settings a reload replaced, when applying it failed, along
+    # with the config layers they were read from
+    global _settings
+    ConfigLoader.restore({name: dict(section) for name, section in settings.sections.items()})
+    _settings = settings
@@ -0,0 +1,77 @@
+from __future__ import annotations
+import asyncio
+from typing import Any, Awaitable, Callable, Coroutine, Optional, TypeVar
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+
+T = TypeVar("T")
+
+# Set once when the service is asked to stop (SIGTERM / SIGINT). Loops check it
+# between units of work and wait through idle(), so they finish what they have
+# started and return instead of being cancelled halfway.
+shutting_down = asyncio.Event()
+
+
+async def idle(timeout: float, *wake: asyncio.Event) -> None:
+    # sleeps up to timeout; returns early when one of `wake` is set or on shutdown
+    waiters = [asyncio.ensure_future(e.wait()) for e in (shutting_down, *wake)]
+    try:
+        await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for w in waiters:
+            w.cancel()
+
+
+async def until_shutdown(coro: Coroutine[Any, Any, T]) -> Optional[T]:
+    # for work that is safe to abandon (standing by, long polls): it is cancelled
+    # on shutdown and None is returned
+    task = asyncio.ensure_future(coro)
+    stop = asyncio.ensure_future(shutting_down.wait())
+    try:
+        await asyncio.wait({task, stop}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stop.cancel()
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    return None if task.cancelled() else task.result()
+
+
+class InFlightUpdates(BaseMiddleware):
+    # Update middleware that counts the updates being handled, so the
+    # shutdown can wait for them before the pool and the Bot session go away.
+    def __init__(self) -> None:
+        self.count = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        self.count += 1
+        self._idle.clear()
+        try:
+            return await handler(event, data)
+        finally:
+            self.count -= 1
+            if self.count == 0:
+                self._idle.set()
+
+
+    async def wait_idle(self, timeout: float) -> bool:
+        # polling and webhook handlers run as tasks that may not have started yet
+        await asyncio.sleep(0)
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=max(timeout, 0))
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+in_flight = InFlightUpdates()
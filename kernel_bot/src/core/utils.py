@@ -1,4 +1,4 @@
-import json
+import codecs
 import os
 import os.path
 import shutil
@@ -7,14 +7,12 @@ from datetime import datetime
 from inspect import getframeinfo, stack
 from pathlib import Path
 from typing import Any
-from zoneinfo import ZoneInfo
 
-import bcrypt
-import chardet
 import colorama# type: ignore[import-untyped]
 from dotenv import find_dotenv, load_dotenv
 from loguru import logger
-from pydantic import ValidationError
+
+from src.core import json_codec
 
 
 class MethodTools:
@@ -145,25 +143,48 @@ class EnvTools:
             )
 
 
+# checked longest first, the UTF-32 LE mark starts with the UTF-16 LE one
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
 class JsonLoader:
+    @staticmethod
+    def decode(raw: bytes) -> str:
+        # BOM, then plain UTF-8; chardet only for whatever is left
+        for bom, encoding in _BOMS:
+            if raw.startswith(bom):
+                return raw.decode(encoding)
+        try:
+            return raw.decode("utf-8")
+        except UnicodeDecodeError:
+            # chardet, bcrypt and pydantic are imported on first use, most processes never need them
+            import chardet
+            return raw.decode(chardet.detect(raw)["encoding"] or "utf-8")
+
+
     @staticmethod
     def read_json(path: str) -> dict[str, Any]:
         try:
             with open(os.path.abspath(path), "rb") as file:
                 raw_data = file.read()
-                detected_encoding = chardet.detect(raw_data)["encoding"]
-
-            with open(os.path.abspath(path), encoding=detected_encoding) as file:
-                data = json.load(file)
-                if isinstance(data, dict):
-                    info: dict[str, Any] = data
-                else:
-                    logger.error("JSON root is not an object: %s", type(data).__name__)
-                    info = {}
+
+            data = json_codec.loads(JsonLoader.decode(raw_data))
+            if isinstance(data, dict):
+                info: dict[str, Any] = data
+            else:
+                logger.error(f"JSON root is not an object: {type(data).__name__}")
+                info = {}
         except FileNotFoundError as ex:
             logger.error(f"Error during reading JSON file {path}: {ex}")
             info = {}
-        except (UnicodeDecodeError, json.JSONDecodeError) as ex:
+        except (LookupError, ValueError) as ex:
+            # ValueError covers UnicodeDecodeError and every backend's decode error
             logger.error(f"Error during reading JSON file {path}: {ex}")
             info = {}
         return info
@@ -173,7 +194,7 @@ class JsonLoader:
     def write_json(path: str, data: str) -> None:
         try:
             with open(os.path.abspath(path), "w", encoding="utf-8") as file:
-                json.dump(data, file, ensure_ascii=False, indent=4)
+                file.write(json_codec.dumps_pretty(data))
         except Exception as e:
             logger.error(f"Error writing JSON file {path}: {e}")
 
@@ -193,6 +214,7 @@ class Filters:
 class StringTools:
     @staticmethod
     def hash_string(string: str) -> str:
+        import bcrypt
         salt = bcrypt.gensalt()
         return bcrypt.hashpw(string.encode('utf-8'), salt).decode('utf-8')
 
@@ -200,14 +222,9 @@ class StringTools:
 class TimeTools:
     @staticmethod
     def now_time_zone() -> datetime:
-        tz_name = EnvTools.load_env_var("TZ") or "UTC"
-        try:
-            tz = ZoneInfo(tz_name)
-
-        except Exception:
-            tz = ZoneInfo("UTC")
-
-        return datetime.now(tz)
+        # imported here, settings depend on this module through ConfigLoader
+        from src.core.settings import get_settings
+        return datetime.now(get_settings().tz)
 
 
     @staticmethod
@@ -215,9 +232,17 @@ class TimeTools:
         return int(TimeTools.now_time_zone().timestamp())
 
 
+    @staticmethod
+    def from_time_stamp(time_stamp: int) -> datetime:
+        from src.core.settings import get_settings
+        return datetime.fromtimestamp(time_stamp, get_settings().tz)
+
+
 class ValidatingTools:
     @staticmethod
     def validate_models_by_schema(models: Any, schema: Any) -> Any:
+        from pydantic import ValidationError
+
         if not isinstance(models, Iterable):
             models = [models]
 
@@ -0,0 +1,48 @@
+# pyright: strict
+from __future__ import annotations
+from typing import Any, Optional
+
+from sqlalchemy import Select, bindparam, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .member_cache import MemberRecord
+from .models import Member
+from .routing import READ_REPLICA
+
+
+# Core-SQL member reads, chosen with [db] dao = "core" (see MemberReads in
+# data_access_module). The statements are built once on the table, not the
+# mapped class, so a read skips statement construction, the ORM compile step,
+# identity map and entity hydration, and hands back a MemberRecord directly.
+# Writes stay on MemberDAO.
+
+_members = Member.__table__
+
+
+def _member_by(column: str) -> Select[Any]:
+    c = _members.c
+    return (
+        select(c.id, c.tg_user_id, c.user_name, c.first_name, c.last_name, c.role, c.bio)
+        .where(c[column] == bindparam(column))
+        .execution_options(**READ_REPLICA)
+    )
+
+
+_MEMBER_BY_USERNAME = _member_by("user_name")
+_MEMBER_BY_TG_USER_ID = _member_by("tg_user_id")
+
+
+async def _member(session: AsyncSession, stmt: Select[Any], params: dict[str, Any]) -> Optional[MemberRecord]:
+    row = (await session.execute(stmt, params)).first()
+    return None if row is None else MemberRecord(*row)
+
+
+class CoreMemberDAO:
+    @staticmethod
+    async def get_by_username(session: AsyncSession, username: str) -> Optional[MemberRecord]:
+        return await _member(session, _MEMBER_BY_USERNAME, {"user_name": username})
+
+
+    @staticmethod
+    async def get_by_tg_user_id(session: AsyncSession, tg_user_id: int) -> Optional[MemberRecord]:
+        return await _member(session, _MEMBER_BY_TG_USER_ID, {"tg_user_id": tg_user_id})
@@ -1,30 +1,72 @@
 # pyright: strict
 from __future__ import annotations
-from typing import Optional
+import asyncio
+from typing import TYPE_CHECKING, Iterable, Mapping, Optional, Protocol, Union
 from uuid import UUID
 
-from sqlalchemy import select, delete
+from sqlalchemy import BigInteger, any_, bindparam, exists, func, select, delete, literal_column, text, update
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
+from src.core.utils import TimeTools
+from .member_cache import MemberRecord, invalidate_on_commit, member_cache
+from .member_index import member_index
 from .models import (
     Member,
     MemberRole,
     Application,
     ApplicationStatus,
     Invite,
+    InboxUpdate,
+    OutboxMessage,
+    OutboxStatus,
 )
+from .routing import READ_REPLICA
+from .session_hooks import on_commit
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+
+PERSONAL_INVITE_TTL_SECONDS = 24 * 60 * 60
+# asyncpg caps a statement at 32767 bind parameters; a member row binds 7
+# once the id/role/bio defaults are filled in
+BULK_UPSERT_CHUNK_SIZE = 4000
+# insert-or-read rounds before giving up on a pending row that keeps changing
+PENDING_APP_ATTEMPTS = 3
+_NOW_EPOCH = literal_column("(EXTRACT(EPOCH FROM NOW()))::bigint", BigInteger)
+
+# set once a transaction that enqueued outbox messages commits, wakes the sender
+outbox_pending = asyncio.Event()
+# set once an invite was taken from the prewarmed pool, wakes the replenisher
+invite_pool_taken = asyncio.Event()
+# set once new updates were committed to the inbox, wakes the local workers
+inbox_pending = asyncio.Event()
+
+
+def _member_written(session: AsyncSession, record: MemberRecord) -> None:
+    invalidate_on_commit(session.sync_session, tg_user_id=record.tg_user_id, username=record.user_name)
+    on_commit(session.sync_session, lambda: member_index.upsert(record))
 
 
 class MemberDAO:
     @staticmethod
     async def get_by_id(session: AsyncSession, member_id: UUID) -> Optional[Member]:
-        res = await session.execute(select(Member).where(Member.id == member_id))
+        res = await session.execute(select(Member).where(Member.id == member_id).execution_options(**READ_REPLICA))
         return res.scalar_one_or_none()
 
 
     @staticmethod
     async def get_by_username(session: AsyncSession, username: str) -> Optional[Member]:
-        res = await session.execute(select(Member).where(Member.user_name == username))
+        res = await session.execute(select(Member).where(Member.user_name == username).execution_options(**READ_REPLICA))
+        return res.scalar_one_or_none()
+
+
+    @staticmethod
+    async def get_by_tg_user_id(session: AsyncSession, tg_user_id: int) -> Optional[Member]:
+        res = await session.execute(select(Member).where(Member.tg_user_id == tg_user_id).execution_options(**READ_REPLICA))
         return res.scalar_one_or_none()
 
 
@@ -32,6 +74,7 @@ class MemberDAO:
     async def create(
         session: AsyncSession,
         *,
+        tg_user_id: int,
         user_name: str,
         first_name: str,
         last_name: str,
@@ -39,6 +82,7 @@ class MemberDAO:
         bio: str = "",
     ) -> Member:
         obj = Member(
+            tg_user_id=tg_user_id,
             user_name=user_name,
             first_name=first_name,
             last_name=last_name,
@@ -47,6 +91,7 @@ class MemberDAO:
         )
         session.add(obj)
         await session.flush()
+        _member_written(session, MemberRecord.from_model(obj))
         return obj
 
 
@@ -54,37 +99,100 @@ class MemberDAO:
     async def upsert_by_username(
         session: AsyncSession,
         *,
+        tg_user_id: int,
         user_name: str,
         first_name: str,
         last_name: str,
     ) -> Member:
+        # rows are matched on the telegram id, username and names are refreshed;
+        # a single INSERT .. ON CONFLICT keeps concurrent joins from racing
+        stmt = insert(Member).values(
+            tg_user_id=tg_user_id,
+            user_name=user_name,
+            first_name=first_name,
+            last_name=last_name,
+            role=MemberRole.member,
+            bio="",
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Member.tg_user_id],
+            set_={
+                "user_name": stmt.excluded.user_name,
+                "first_name": stmt.excluded.first_name,
+                "last_name": stmt.excluded.last_name,
+                "updated_at": _NOW_EPOCH,
+            },
+        ).returning(Member)
+        res = await session.execute(stmt, execution_options={"populate_existing": True})
+        obj = res.scalar_one()
+        _member_written(session, MemberRecord.from_model(obj))
+        return obj
+
 
-        res = await session.execute(select(Member).where(Member.user_name == user_name))
-        obj = res.scalar_one_or_none()
-        if obj is None:
-            obj = Member(
-                user_name=user_name,
-                first_name=first_name,
-                last_name=last_name,
-                role=MemberRole.member,
-                bio="",
+    @staticmethod
+    async def bulk_upsert(
+        session: AsyncSession,
+        rows: Iterable[Mapping[str, object]],
+    ) -> list[MemberRecord]:
+        # rows carry tg_user_id, user_name, first_name and last_name; one statement
+        # per BULK_UPSERT_CHUNK_SIZE rows, the last row wins for a repeated tg_user_id
+        unique: dict[int, dict[str, object]] = {}
+        for row in rows:
+            tg_user_id = int(row["tg_user_id"])  # type: ignore[call-overload]
+            unique[tg_user_id] = {
+                "tg_user_id": tg_user_id,
+                "user_name": row.get("user_name") or "",
+                "first_name": row.get("first_name") or "",
+                "last_name": row.get("last_name") or "",
+            }
+
+        values = list(unique.values())
+        records: list[MemberRecord] = []
+        for start in range(0, len(values), BULK_UPSERT_CHUNK_SIZE):
+            stmt = insert(Member).values(values[start:start + BULK_UPSERT_CHUNK_SIZE])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Member.tg_user_id],
+                set_={
+                    "user_name": stmt.excluded.user_name,
+                    "first_name": stmt.excluded.first_name,
+                    "last_name": stmt.excluded.last_name,
+                    "updated_at": _NOW_EPOCH,
+                },
+            ).returning(
+                Member.id,
+                Member.tg_user_id,
+                Member.user_name,
+                Member.first_name,
+                Member.last_name,
+                Member.role,
+                Member.bio,
             )
-            session.add(obj)
-        else:
-            obj.first_name = first_name
-            obj.last_name = last_name
-        await session.flush()
-        return obj
+            res = await session.execute(stmt)
+            records.extend(MemberRecord(*row) for row in res.all())
+
+        for record in records:
+            _member_written(session, record)
+        return records
 
 
     @staticmethod
     async def update_bio(session: AsyncSession, member: Member, bio: str) -> None:
         member.bio = bio
+        _member_written(session, MemberRecord.from_model(member))
 
 
     @staticmethod
     async def delete_by_id(session: AsyncSession, member_id: UUID) -> None:
         await session.execute(delete(Member).where(Member.id == member_id))
+        invalidate_on_commit(session.sync_session, member_id=member_id)
+        on_commit(session.sync_session, lambda: member_index.remove_by_member_id(member_id))
+
+
+    @staticmethod
+    async def delete_by_tg_user_id(session: AsyncSession, tg_user_id: int) -> None:
+        await session.execute(delete(Member).where(Member.tg_user_id == tg_user_id))
+        invalidate_on_commit(session.sync_session, tg_user_id=tg_user_id)
+        on_commit(session.sync_session, lambda: member_index.remove(tg_user_id))
 
 
 class ApplicationDAO:
@@ -102,6 +210,37 @@ class ApplicationDAO:
         return res.scalar_one_or_none()
 
 
+    @staticmethod
+    async def get_or_create_pending(
+        session: AsyncSession,
+        tg_user_id: int,
+    ) -> tuple[Application, bool]:
+        # returns the pending application and whether it was created just now;
+        # the partial unique index makes a second pending row impossible
+        for _ in range(PENDING_APP_ATTEMPTS):
+            res = await session.execute(
+                insert(Application)
+                .values(tg_user_id=tg_user_id, status=ApplicationStatus.pending)
+                .on_conflict_do_nothing(
+                    index_elements=[Application.tg_user_id],
+                    index_where=text("status = 'pending'"),
+                )
+                .returning(Application)
+            )
+            app = res.scalar_one_or_none()
+            if app is not None:
+                return app, True
+
+            existing = await ApplicationDAO.get_pending_by_tg_user_id(session, tg_user_id)
+            if existing is not None:
+                return existing, False
+            # the conflicting row was approved or removed in between
+        raise RuntimeError(
+            f"No pending application for {tg_user_id} after {PENDING_APP_ATTEMPTS} attempts, "
+            "the conflicting row keeps changing"
+        )
+
+
     @staticmethod
     async def create(session: AsyncSession, *, tg_user_id: int) -> Application:
         app = Application(tg_user_id=tg_user_id, status=ApplicationStatus.pending)
@@ -127,18 +266,12 @@ class ApplicationDAO:
 
 
 class InviteDAO:
-    @staticmethod
-    async def get_by_link(session: AsyncSession, invite_link: str) -> Optional[Invite]:
-        res = await session.execute(select(Invite).where(Invite.invite_link == invite_link))
-        return res.scalar_one_or_none()
-
-
     @staticmethod
     async def create(
         session: AsyncSession,
         *,
         chat_id: int,
-        intended_user_id: int,
+        intended_user_id: Optional[int],
         invite_link: str,
         expire_at_unix: int,
         member_limit: int = 1,
@@ -159,9 +292,496 @@ class InviteDAO:
         return inv
 
 
+    @staticmethod
+    async def create_many_unassigned(
+        session: AsyncSession,
+        *,
+        chat_id: int,
+        links: list[tuple[str, int]],
+    ) -> None:
+        # (invite_link, expire_at_unix) pairs for the prewarmed pool
+        if not links:
+            return
+        await session.execute(
+            insert(Invite).values([
+                {
+                    "chat_id": chat_id,
+                    "invite_link": link,
+                    "intended_user_id": None,
+                    "expire_at": expire_at,
+                    "member_limit": 1,
+                    "creates_join_request": True,
+                    "is_revoked": False,
+                }
+                for link, expire_at in links
+            ])
+        )
+
+
+    @staticmethod
+    async def count_unassigned(session: AsyncSession, *, chat_id: int, min_expire_at: int) -> int:
+        res = await session.execute(
+            select(func.count()).select_from(Invite).where(
+                Invite.chat_id == chat_id,
+                Invite.intended_user_id.is_(None),
+                ~Invite.is_revoked,
+                Invite.expire_at > min_expire_at,
+            )
+        )
+        return int(res.scalar_one())
+
+
+    @staticmethod
+    async def assign_from_pool(
+        session: AsyncSession,
+        *,
+        chat_id: int,
+        intended_user_id: int,
+        min_expire_at: int,
+    ) -> Optional[Invite]:
+        # hands the freshest unassigned link to the user in one UPDATE; SKIP LOCKED
+        # lets concurrent approvals pick different links instead of queueing
+        free = (
+            select(Invite.id)
+            .where(
+                Invite.chat_id == chat_id,
+                Invite.intended_user_id.is_(None),
+                ~Invite.is_revoked,
+                Invite.expire_at > min_expire_at,
+            )
+            .order_by(Invite.expire_at.desc())
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        res = await session.execute(
+            update(Invite)
+            .where(Invite.id == free.scalar_subquery())
+            .values(intended_user_id=intended_user_id)
+            .returning(Invite),
+            execution_options={"synchronize_session": False},
+        )
+        inv = res.scalar_one_or_none()
+        if inv is not None:
+            on_commit(session.sync_session, invite_pool_taken.set)
+        return inv
+
+
+    @staticmethod
+    async def retire_unassigned(session: AsyncSession, *, chat_id: int, expire_before: int) -> list[str]:
+        # marks pooled links that would be too short-lived to hand out as revoked
+        res = await session.execute(
+            update(Invite)
+            .where(
+                Invite.chat_id == chat_id,
+                Invite.intended_user_id.is_(None),
+                ~Invite.is_revoked,
+                Invite.expire_at <= expire_before,
+            )
+            .values(is_revoked=True)
+            .returning(Invite.invite_link),
+            execution_options={"synchronize_session": False},
+        )
+        return list(res.scalars().all())
+
+
+    @staticmethod
+    async def list_expired(
+        session: AsyncSession,
+        *,
+        now: int,
+        limit: int,
+    ) -> list[tuple[UUID, int, str]]:
+        # (id, chat_id, invite_link) of live links past expire_at, served by the
+        # partial index on expire_at WHERE NOT is_revoked
+        res = await session.execute(
+            select(Invite.id, Invite.chat_id, Invite.invite_link)
+            .where(~Invite.is_revoked, Invite.expire_at <= now)
+            .order_by(Invite.expire_at)
+            .limit(limit)
+        )
+        return [(row.id, row.chat_id, row.invite_link) for row in res]
+
+
+    @staticmethod
+    async def mark_revoked(session: AsyncSession, ids: list[UUID]) -> None:
+        if not ids:
+            return
+        await session.execute(
+            update(Invite)
+            .where(Invite.id == any_(bindparam("ids", ids, type_=ARRAY(PG_UUID(as_uuid=True)))))
+            .values(is_revoked=True),
+            execution_options={"synchronize_session": False},
+        )
+
+
+    @staticmethod
+    async def claim(
+        session: AsyncSession,
+        *,
+        invite_link: str,
+        chat_id: int,
+    ) -> Optional[Invite]:
+        # revokes the invite and returns it in one conditional UPDATE; only one of
+        # several concurrent join requests on the same link gets a row back
+        res = await session.execute(
+            update(Invite)
+            .where(
+                Invite.invite_link == invite_link,
+                Invite.chat_id == chat_id,
+                ~Invite.is_revoked,
+            )
+            .values(is_revoked=True)
+            .returning(Invite),
+            execution_options={"synchronize_session": False},
+        )
+        return res.scalar_one_or_none()
+
+
     @staticmethod
     async def revoke(session: AsyncSession, invite: Invite) -> None:
         invite.is_revoked = True
 
 
+class OutboxDAO:
+    @staticmethod
+    async def enqueue(session: AsyncSession, method: str, **payload: object) -> None:
+        # `method` is an aiogram Bot method name, `payload` its JSON-serializable kwargs
+        session.add(OutboxMessage(method=method, payload=payload, status=OutboxStatus.pending))
+        on_commit(session.sync_session, outbox_pending.set)
+
 
+    @staticmethod
+    async def lease_batch(
+        session: AsyncSession,
+        *,
+        limit: int,
+        lease_seconds: int,
+    ) -> list[OutboxMessage]:
+        # pushes next_attempt_at past the lease instead of holding row locks while
+        # the messages are delivered; rows of a crashed sender come back afterwards.
+        # A message waits while an earlier one to the same chat is waiting for a
+        # retry (or leased), so a chat's calls go out in id order.
+        earlier = aliased(OutboxMessage)
+        blocked = exists().where(
+            earlier.status == OutboxStatus.pending,
+            earlier.next_attempt_at > _NOW_EPOCH,
+            earlier.id < OutboxMessage.id,
+            earlier.payload["chat_id"] == OutboxMessage.payload["chat_id"],
+        )
+        due = (
+            select(OutboxMessage.id)
+            .where(
+                OutboxMessage.status == OutboxStatus.pending,
+                OutboxMessage.next_attempt_at <= _NOW_EPOCH,
+                ~blocked,
+            )
+            .order_by(OutboxMessage.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        res = await session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(due.scalar_subquery()))
+            .values(
+                next_attempt_at=_NOW_EPOCH + lease_seconds,
+                attempts=OutboxMessage.attempts + 1,
+            )
+            .returning(OutboxMessage),
+            execution_options={"synchronize_session": False},
+        )
+        return sorted(res.scalars().all(), key=lambda m: m.id)
+
+
+    @staticmethod
+    async def mark_sent(session: AsyncSession, ids: list[int]) -> None:
+        if not ids:
+            return
+        await session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(ids))
+            .values(status=OutboxStatus.sent, last_error=None),
+            execution_options={"synchronize_session": False},
+        )
+
+
+    @staticmethod
+    async def reschedule(
+        session: AsyncSession,
+        message_id: int,
+        *,
+        delay_seconds: int,
+        error: str,
+        count_attempt: bool = True,
+    ) -> None:
+        # count_attempt=False gives back the attempt taken by lease_batch, for a
+        # message that was held back and not sent
+        attempts = OutboxMessage.attempts if count_attempt else OutboxMessage.attempts - 1
+        await session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id == message_id)
+            .values(next_attempt_at=_NOW_EPOCH + delay_seconds, attempts=attempts, last_error=error),
+            execution_options={"synchronize_session": False},
+        )
+
+
+    @staticmethod
+    async def mark_failed(session: AsyncSession, message_id: int, *, error: str) -> None:
+        await session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id == message_id)
+            .values(status=OutboxStatus.failed, last_error=error),
+            execution_options={"synchronize_session": False},
+        )
+
+
+    @staticmethod
+    async def purge_finished(session: AsyncSession, *, older_than_seconds: int) -> None:
+        # sent and failed rows are kept for a while to look into deliveries
+        await session.execute(
+            delete(OutboxMessage).where(
+                OutboxMessage.status != OutboxStatus.pending,
+                OutboxMessage.updated_at < _NOW_EPOCH - older_than_seconds,
+            )
+        )
+
+
+class InboxDAO:
+    @staticmethod
+    async def store(session: AsyncSession, updates: list[tuple[int, dict[str, object]]]) -> None:
+        # (update_id, payload) pairs; updates that are already in the inbox are skipped
+        if not updates:
+            return
+        await session.execute(
+            insert(InboxUpdate)
+            .values([{"update_id": update_id, "payload": payload} for update_id, payload in updates])
+            .on_conflict_do_nothing(index_elements=[InboxUpdate.update_id])
+        )
+        on_commit(session.sync_session, inbox_pending.set)
+
+
+    @staticmethod
+    async def claim(
+        session: AsyncSession,
+        *,
+        limit: int,
+        lease_seconds: int,
+    ) -> list[InboxUpdate]:
+        # leases the oldest unprocessed updates; a worker that dies mid-update
+        # leaves the row to be picked up again once the lease runs out
+        due = (
+            select(InboxUpdate.update_id)
+            .where(
+                InboxUpdate.processed_at.is_(None),
+                InboxUpdate.locked_until <= _NOW_EPOCH,
+            )
+            .order_by(InboxUpdate.update_id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        res = await session.execute(
+            update(InboxUpdate)
+            .where(InboxUpdate.update_id.in_(due.scalar_subquery()))
+            .values(
+                locked_until=_NOW_EPOCH + lease_seconds,
+                attempts=InboxUpdate.attempts + 1,
+            )
+            .returning(InboxUpdate),
+            execution_options={"synchronize_session": False},
+        )
+        return sorted(res.scalars().all(), key=lambda u: u.update_id)
+
+
+    @staticmethod
+    async def mark_processed(
+        session: AsyncSession,
+        update_ids: list[int],
+        *,
+        error: Optional[str] = None,
+    ) -> None:
+        if not update_ids:
+            return
+        await session.execute(
+            update(InboxUpdate)
+            .where(InboxUpdate.update_id.in_(update_ids))
+            .values(processed_at=_NOW_EPOCH, last_error=error),
+            execution_options={"synchronize_session": False},
+        )
+
+
+    @staticmethod
+    async def release(session: AsyncSession, update_id: int, *, delay_seconds: int, error: str) -> None:
+        await session.execute(
+            update(InboxUpdate)
+            .where(InboxUpdate.update_id == update_id)
+            .values(locked_until=_NOW_EPOCH + delay_seconds, last_error=error),
+            execution_options={"synchronize_session": False},
+        )
+
+
+    @staticmethod
+    async def purge_processed(session: AsyncSession, *, older_than_seconds: int) -> None:
+        # processed rows are kept for a while so that a re-delivered update_id is recognised
+        await session.execute(
+            delete(InboxUpdate).where(InboxUpdate.processed_at < _NOW_EPOCH - older_than_seconds)
+        )
+
+
+# Handler-facing helpers. Member reads go through `member_cache` and return
+# detached MemberRecord snapshots; writes go through MemberDAO, which keeps the
+# cache in sync. Reads use the DAO backend picked by use_dao_backend().
+
+DAO_BACKENDS = ("orm", "core")
+
+
+class MemberReads(Protocol):
+    # what get_member / member_by_username need from a DAO backend; MemberDAO
+    # returns mapped entities, core_dao.CoreMemberDAO MemberRecord rows
+    async def get_by_tg_user_id(self, session: AsyncSession, tg_user_id: int) -> Optional[Union[Member, MemberRecord]]: ...
+
+    async def get_by_username(self, session: AsyncSession, username: str) -> Optional[Union[Member, MemberRecord]]: ...
+
+
+_member_reads: MemberReads = MemberDAO
+
+
+def use_dao_backend(name: str) -> None:
+    global _member_reads
+    if name == "orm":
+        _member_reads = MemberDAO
+    elif name == "core":
+        from .core_dao import CoreMemberDAO
+        _member_reads = CoreMemberDAO
+    else:
+        raise ValueError(f"Unknown DAO backend {name!r}, expected one of {', '.join(DAO_BACKENDS)}")
+
+
+def _record(member: Member | MemberRecord) -> MemberRecord:
+    return member if isinstance(member, MemberRecord) else MemberRecord.from_model(member)
+
+
+async def get_member(session: AsyncSession, tg_user_id: int) -> Optional[MemberRecord]:
+    found, record = member_cache.get_by_tg_user_id(tg_user_id)
+    if found:
+        return record
+
+    generation = member_cache.generation()
+    member = await _member_reads.get_by_tg_user_id(session, tg_user_id)
+    if member is None:
+        member_cache.put_absent(tg_user_id, generation)
+        return None
+    record = _record(member)
+    member_cache.put(record, generation)
+    return record
+
+
+async def member_by_username(session: AsyncSession, username: str) -> Optional[MemberRecord]:
+    record = member_cache.get_by_username(username)
+    if record is not None:
+        return record
+
+    generation = member_cache.generation()
+    member = await _member_reads.get_by_username(session, username)
+    if member is None:
+        return None
+    record = _record(member)
+    member_cache.put(record, generation)
+    return record
+
+
+async def upsert_member(
+    session: AsyncSession,
+    *,
+    tg_user_id: int,
+    username: Optional[str],
+    first_name: str,
+    last_name: Optional[str],
+) -> Member:
+    return await MemberDAO.upsert_by_username(
+        session,
+        tg_user_id=tg_user_id,
+        user_name=username or "",
+        first_name=first_name,
+        last_name=last_name or "",
+    )
+
+
+async def set_member_bio(session: AsyncSession, member: Member, bio: str) -> None:
+    await MemberDAO.update_bio(session, member, bio)
+
+
+async def remove_member(session: AsyncSession, tg_user_id: int) -> None:
+    await MemberDAO.delete_by_tg_user_id(session, tg_user_id)
+
+
+async def get_or_create_pending_app(session: AsyncSession, tg_user_id: int) -> tuple[Application, bool]:
+    return await ApplicationDAO.get_or_create_pending(session, tg_user_id)
+
+
+async def approve_app(session: AsyncSession, app: Application, invite_id: UUID) -> None:
+    await ApplicationDAO.mark_approved(session, app, invite_id=invite_id)
+
+
+async def remove_all_apps_for_user(session: AsyncSession, tg_user_id: int) -> None:
+    await ApplicationDAO.remove_all_for_tg_user(session, tg_user_id)
+
+
+async def claim_invite(session: AsyncSession, invite_link: str, chat_id: int) -> Optional[Invite]:
+    return await InviteDAO.claim(session, invite_link=invite_link, chat_id=chat_id)
+
+
+async def take_personal_invite(
+    session: AsyncSession,
+    *,
+    bot: Bot,
+    chat_id: int,
+    intended_user_id: int,
+    min_remaining_seconds: int,
+) -> Invite:
+    # a prewarmed link if there is one left, a freshly created one otherwise.
+    # Has to be called before the update writes anything else.
+    inv = await InviteDAO.assign_from_pool(
+        session,
+        chat_id=chat_id,
+        intended_user_id=intended_user_id,
+        min_expire_at=TimeTools.now_time_stamp() + min_remaining_seconds,
+    )
+    if inv is not None:
+        return inv
+    invite_pool_taken.set()
+    # the empty claim changed no rows; ending its transaction hands the pooled
+    # connection back before Telegram is asked for a link, and the new row goes
+    # into a fresh transaction that the caller commits
+    await session.commit()
+    return await create_personal_invite(
+        session,
+        bot=bot,
+        chat_id=chat_id,
+        intended_user_id=intended_user_id,
+    )
+
+
+async def create_personal_invite(
+    session: AsyncSession,
+    *,
+    bot: Bot,
+    chat_id: int,
+    intended_user_id: int,
+) -> Invite:
+    expire_at = TimeTools.now_time_stamp() + PERSONAL_INVITE_TTL_SECONDS
+    link = await bot.create_chat_invite_link(
+        chat_id=chat_id,
+        name=f"personal:{intended_user_id}",
+        expire_date=expire_at,
+        creates_join_request=True,
+    )
+    return await InviteDAO.create(
+        session,
+        chat_id=chat_id,
+        intended_user_id=intended_user_id,
+        invite_link=link.invite_link,
+        expire_at_unix=expire_at,
+    )
+
+
+async def enqueue_telegram_call(session: AsyncSession, method: str, **payload: object) -> None:
+    await OutboxDAO.enqueue(session, method, **payload)
@@ -1,57 +1,170 @@
+import asyncio
 import colorama
 from .models.base_model import Base
 from loguru import logger
-from typing import AsyncIterator
+from typing import Any, AsyncIterator, Optional, Union
 from contextlib import asynccontextmanager
 from sqlalchemy import (
+    URL,
     text,
 )
 from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.pool import Pool
+from sqlalchemy.util import greenlet_spawn
 
-from src.core.config import ConfigLoader
-from src.core.utils import EnvTools
+from src.core import json_codec
+from src.core.settings import Settings, get_settings
+from src.services.metrics.prometheus import InstrumentedPool
+from .health import DbHealthMonitor
+from .routing import ReplicaRouter, RoutingSession
 
 
 class DataBase:
     def __init__(self,) -> None:
-        self.config = ConfigLoader()
+        self.settings = get_settings()
         self.engine = None
-        self.db_host = EnvTools.get_service_ip("postgres")
-        self.db_port = EnvTools.get_service_port("postgres")
-        self.db_user = EnvTools.load_env_var("POSTGRES_USER")
-        self.db_pwd = EnvTools.load_env_var("POSTGRES_PASSWORD")
-        self.db_name = EnvTools.load_env_var("POSTGRES_DB")
-        self.engine_config = f"postgresql+asyncpg://{self.db_user}:{self.db_pwd}@{self.db_host}:{self.db_port}/{self.db_name}"
+        self.engine_config = self.settings.postgres.url
+        self.replica: Optional[ReplicaRouter] = None
+        self._replica_monitor: Optional[asyncio.Task[None]] = None
+        self.health: Optional[DbHealthMonitor] = None
+        self._health_monitor: Optional[asyncio.Task[None]] = None
+        self._retiring: set[asyncio.Task[None]] = set()
+        # what the current pools were built with
+        self._pool_config: dict[str, Any] = {}
         self.async_session = None
 
 
-    async def init_alchemy_engine(self,) -> None:
-        logger.info("Starting service..")
-        self.engine = create_async_engine(
-            url=self.engine_config,
-            echo=self.config.get("db", "echo"),
-            pool_size=10, # count of active connections in pool
-            max_overflow=20, # max amount of connections
-            pool_timeout=15,
-            pool_recycle=1800,
-            pool_pre_ping=True,
+    def _pool_options(self) -> dict[str, Any]:
+        db = self.settings.section("db")
+        return {
+            "pool_size": db["pool_size"],  # count of active connections in pool
+            "max_overflow": db["max_overflow"],  # extra connections above pool_size
+            "pool_timeout": db["pool_timeout"],
+            "pool_recycle": db["pool_recycle"],
+            # off by default, DbHealthMonitor pings in the background instead
+            "pool_pre_ping": db["pre_ping"],
+        }
+
+
+    def _create_engine(self, url: Union[str, URL]) -> AsyncEngine:
+        return create_async_engine(
+            url=url,
+            echo=self.settings.value("db", "echo"),
+            **self._pool_options(),
+            poolclass=InstrumentedPool,
+            # JSONB columns: inbox payloads, outbox payloads, FSM data
+            json_serializer=json_codec.dumps,
+            json_deserializer=json_codec.loads,
             future=True,
         )
 
+
+    async def init_alchemy_engine(self,) -> None:
+        logger.info("Starting service..")
+        self._pool_config = self._pool_options()
+        self.engine = self._create_engine(self.engine_config)
+        pg = self.settings.postgres
+        if pg.replica_url:
+            # optional streaming replica for reads, e.g. a second local Postgres
+            self.replica = ReplicaRouter(
+                self._create_engine(pg.replica_url),
+                max_lag_seconds=self.settings.value("db", "replica_max_lag_seconds"),
+                check_interval=self.settings.value("db", "replica_check_interval"),
+            )
+
         self.async_session = async_sessionmaker(
             self.engine,
             expire_on_commit=False,
-            class_=AsyncSession
+            class_=AsyncSession,
+            sync_session_class=RoutingSession,
+            replica=self.replica,
         )
 
-        if await self.test_connection():
-            logger.info(f"{colorama.Fore.GREEN}Connection with data base has been established!")
-        else:
-            raise Exception(f"{colorama.Fore.RED}Cannot establish connection with data base.")
+        self.health = DbHealthMonitor(
+            self.engine,
+            interval=self.settings.value("db", "health_interval"),
+            timeout=self.settings.value("db", "health_timeout"),
+        )
+        # both servers are connected to at the same time
+        checks = [self.health.ping()]
+        if self.replica is not None:
+            checks.append(self.replica.check())
+        connected, *_ = await asyncio.gather(*checks)
+        if not connected:
+            raise Exception(f"{colorama.Fore.RED}Cannot establish connection with data base: {self.health.last_error}")
+        logger.info(f"{colorama.Fore.GREEN}Connection with data base has been established!")
+        self._health_monitor = asyncio.create_task(self.health.run(), name="db-health")
+
+        if self.replica is not None:
+            self._replica_monitor = asyncio.create_task(self.replica.run(), name="replica-monitor")
+            logger.info(f"Routing marked reads to replica {pg.replica_host}:{pg.replica_port}")
+
+
+    async def apply_pool_config(self, settings: Settings) -> None:
+        # called after a config reload, and again with the previous settings when
+        # the reload is rolled back; in-flight sessions keep their connections
+        self.settings = settings
+        if self.health is not None:
+            self.health.interval = self.settings.value("db", "health_interval")
+            self.health.timeout = self.settings.value("db", "health_timeout")
+        engines = [e for e in (self.engine, self.replica.engine if self.replica else None) if e is not None]
+        for engine in engines:
+            engine.sync_engine.echo = self.settings.value("db", "echo")
+
+        options = self._pool_options()
+        if options == self._pool_config:
+            return
+        # recorded first, so a rollback after a partial swap swaps every pool back
+        logger.info(f"Swapping the connection pools: {self._pool_config} -> {options}")
+        self._pool_config = options
+        for engine in engines:
+            await self._swap_pool(engine)
+
+
+    async def _swap_pool(self, engine: AsyncEngine) -> None:
+        # the pool comes from a throwaway engine built like this one, so it has
+        # the new sizing and the same dialect setup for the connections it opens
+        old = engine.sync_engine.pool
+        engine.sync_engine.pool = self._create_engine(engine.url).sync_engine.pool
+        # idle connections are closed right away; busy ones return to the old
+        # pool when their session ends and are closed by a later pass
+        await greenlet_spawn(old.dispose)
+        task = asyncio.create_task(
+            self._retire(old, after=self.settings.value("db", "pool_timeout") + 60),
+            name="pool-retire",
+        )
+        self._retiring.add(task)
+        task.add_done_callback(self._retiring.discard)
+
+
+    @staticmethod
+    async def _retire(pool: Pool, *, after: float) -> None:
+        await asyncio.sleep(after)
+        await greenlet_spawn(pool.dispose)
+
+
+    async def dispose(self) -> None:
+        for task in list(self._retiring):
+            task.cancel()
+        if self._health_monitor is not None:
+            self._health_monitor.cancel()
+            await asyncio.gather(self._health_monitor, return_exceptions=True)
+            self._health_monitor = None
+        if self.health is not None:
+            await self.health.close()
+        if self._replica_monitor is not None:
+            self._replica_monitor.cancel()
+            await asyncio.gather(self._replica_monitor, return_exceptions=True)
+            self._replica_monitor = None
+        if self.replica is not None:
+            await self.replica.engine.dispose()
+        if self.engine is not None:
+            await self.engine.dispose()
 
 
     async def get_session(self) -> AsyncIterator[AsyncSession]:
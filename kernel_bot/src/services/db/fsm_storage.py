@@ -0,0 +1,234 @@
+from __future__ import annotations
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from loguru import logger
+from sqlalchemy import delete, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .models import FsmState
+
+
+@dataclass(slots=True)
+class _Record:
+    state: Optional[str] = None
+    data: dict[str, Any] = field(default_factory=dict)
+    touched_at: float = 0.0
+
+
+# Write-back cache in front of the `fsm_states` table: writes only mark a record
+# dirty, a background task upserts dirty records in batches, and records idle for
+# longer than ttl_seconds are dropped from memory once they are flushed.
+# With write_through the cache is bypassed: every read and write goes to the
+# table, for when other processes handle updates of the same chats.
+class PostgresStorage(BaseStorage):
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        *,
+        ttl_seconds: float = 1800.0,
+        max_cached: int = 10_000,
+        flush_interval: float = 1.0,
+        flush_batch_size: int = 500,
+        write_through: bool = False,
+    ) -> None:
+        self._session_factory = session_factory
+        self._write_through = write_through
+        self._key_builder = DefaultKeyBuilder(with_destiny=True)
+        self._ttl = ttl_seconds
+        self._max_cached = max_cached
+        self._flush_interval = flush_interval
+        self._batch_size = flush_batch_size
+
+        self._cache: OrderedDict[str, _Record] = OrderedDict()
+        self._dirty: set[str] = set()
+        self._flushing: set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._flush_task: Optional[asyncio.Task[None]] = None
+        self._flush_lock = asyncio.Lock()
+
+
+    def configure(
+        self,
+        *,
+        ttl_seconds: float,
+        max_cached: int,
+        flush_interval: float,
+        flush_batch_size: int,
+    ) -> None:
+        self._ttl = ttl_seconds
+        self._max_cached = max_cached
+        self._flush_interval = flush_interval
+        self._batch_size = flush_batch_size
+        self._evict_overflow()
+
+
+    async def _load(self, k: str) -> _Record:
+        async with self._session_factory() as session:
+            res = await session.execute(
+                select(FsmState.state, FsmState.data).where(FsmState.key == k)
+            )
+            row = res.one_or_none()
+        return _Record() if row is None else _Record(state=row.state, data=dict(row.data))
+
+
+    async def _record(self, key: StorageKey) -> tuple[str, _Record]:
+        k = self._key_builder.build(key)
+        if self._write_through:
+            return k, await self._load(k)
+        record = self._cache.get(k)
+        if record is None:
+            loaded = await self._load(k)
+            # another coroutine may have loaded the same key while we were waiting
+            record = self._cache.get(k)
+            if record is None:
+                record = self._cache[k] = loaded
+                self._evict_overflow()
+
+        record.touched_at = time.monotonic()
+        self._cache.move_to_end(k)
+        return k, record
+
+
+    async def _store(self, k: str, record: _Record) -> None:
+        if self._write_through:
+            await self._write({k: record})
+        else:
+            self._mark_dirty(k)
+
+
+    def _mark_dirty(self, k: str) -> None:
+        self._dirty.add(k)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop(), name="fsm-storage-flush")
+        if len(self._dirty) >= self._batch_size:
+            self._wakeup.set()
+
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        k, record = await self._record(key)
+        record.state = state.state if isinstance(state, State) else state
+        await self._store(k, record)
+
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        _, record = await self._record(key)
+        return record.state
+
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        k, record = await self._record(key)
+        record.data = dict(data)
+        await self._store(k, record)
+
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, record = await self._record(key)
+        return record.data.copy()
+
+
+    def _evict_overflow(self) -> None:
+        if len(self._cache) <= self._max_cached:
+            return
+        for k in list(self._cache):
+            if len(self._cache) <= self._max_cached:
+                return
+            if k not in self._dirty and k not in self._flushing:
+                del self._cache[k]
+        # everything left is waiting to be written, flush early so it can be evicted
+        self._wakeup.set()
+
+
+    def _evict_idle(self) -> None:
+        deadline = time.monotonic() - self._ttl
+        for k in list(self._cache):
+            record = self._cache[k]
+            if record.touched_at > deadline:
+                break  # cache is ordered by last access
+            if k not in self._dirty and k not in self._flushing:
+                del self._cache[k]
+
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            while self._dirty:
+                keys = [self._dirty.pop() for _ in range(min(self._batch_size, len(self._dirty)))]
+                await self._flush_batch(keys)
+
+
+    async def _flush_batch(self, keys: list[str]) -> None:
+        self._flushing.update(keys)
+        try:
+            await self._write({k: self._cache[k] for k in keys})
+        except Exception:
+            # keep the changes in memory and retry on the next round
+            self._dirty.update(keys)
+            raise
+        finally:
+            self._flushing.difference_update(keys)
+
+
+    async def _write(self, records: Mapping[str, _Record]) -> None:
+        upserts: list[dict[str, Any]] = []
+        deletes: list[str] = []
+        for k, record in records.items():
+            if record.state is None and not record.data:
+                deletes.append(k)
+            else:
+                upserts.append({"key": k, "state": record.state, "data": dict(record.data)})
+
+        async with self._session_factory() as session:
+            if upserts:
+                stmt = insert(FsmState).values(upserts)
+                await session.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=[FsmState.key],
+                        set_={
+                            "state": stmt.excluded.state,
+                            "data": stmt.excluded.data,
+                            "updated_at": text("(EXTRACT(EPOCH FROM NOW()))::bigint"),
+                        },
+                    )
+                )
+            if deletes:
+                await session.execute(delete(FsmState).where(FsmState.key.in_(deletes)))
+            await session.commit()
+
+
+    async def _flush_loop(self) -> None:
+        # The cache is per process, so it only runs where this process is the
+        # only one handling updates (polling, webhook). In inbox and worker mode
+        # updates of one chat may land on any worker, and a cached state there
+        # would be stale and overwritten by the last flush; bot.py builds the
+        # storage with write_through for those modes and this loop never starts.
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception as ex:
+                logger.error(f"FSM storage flush failed: {ex}")
+                await asyncio.sleep(self._flush_interval)
+            self._evict_idle()
+            self._evict_overflow()
+
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
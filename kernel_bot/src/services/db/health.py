@@ -0,0 +1,119 @@
+from __future__ import annotations
+import asyncio
+import time
+from typing import Any, Optional
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlalchemy.util import greenlet_spawn
+
+from src.services.metrics.prometheus import DB_PING_LATENCY, DB_UP
+
+
+_PING = text("SELECT 1")
+
+
+class DbHealthMonitor:
+    # Replaces pool_pre_ping: one SELECT 1 every `interval` instead of one per
+    # connection checkout. The ping opens its own connection outside the pool,
+    # so a pool exhausted by busy handlers does not look like a dead database.
+    # A failed ping closes the idle pooled connections, so after a Postgres
+    # restart updates get fresh ones instead of dead sockets; connections that
+    # are checked out are invalidated by SQLAlchemy on their first disconnect
+    # error. ready() backs the /health/ready probe.
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        *,
+        interval: float = 5.0,
+        timeout: float = 3.0,
+    ) -> None:
+        self.engine = engine
+        self._probe = create_async_engine(engine.url, poolclass=NullPool)
+        self.interval = interval
+        self.timeout = timeout
+        self.alive = False
+        self.latency: Optional[float] = None
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self._checked_at = 0.0
+
+
+    def fresh(self) -> bool:
+        # a result older than a few intervals means the monitor (or the loop) is stuck
+        return time.monotonic() - self._checked_at < self.interval * 3 + self.timeout
+
+
+    def ready(self) -> bool:
+        return self.alive and self.fresh()
+
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "alive": self.alive,
+            "fresh": self.fresh(),
+            "latency_ms": None if self.latency is None else round(self.latency * 1000, 2),
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+
+    async def _select_one(self) -> None:
+        async with self._probe.connect() as conn:
+            await conn.execute(_PING)
+
+
+    async def _attempt(self) -> Optional[str]:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._select_one(), timeout=self.timeout)
+        except Exception as ex:
+            return f"{type(ex).__name__}: {ex}"
+        self.latency = time.perf_counter() - started
+        DB_PING_LATENCY.observe(self.latency)
+        return None
+
+
+    async def _drop_idle(self) -> None:
+        try:
+            await greenlet_spawn(self.engine.sync_engine.pool.dispose)
+        except Exception as ex:
+            logger.warning(f"Could not dispose the idle connections: {ex}")
+
+
+    async def ping(self) -> bool:
+        error = await self._attempt()
+        if error is not None:
+            # one more try for a blip; the pooled connections are likely dead sockets
+            # if the server really went away, so they go either way
+            await self._drop_idle()
+            error = await self._attempt()
+
+        if error is None:
+            if self.failures:
+                logger.info(f"Database is reachable again after {self.failures} failed pings")
+            self.alive = True
+            self.failures = 0
+            self.last_error = None
+        else:
+            if self.failures == 0:
+                logger.error(f"Database ping failed: {error}")
+            self.alive = False
+            self.failures += 1
+            self.last_error = error
+        self._checked_at = time.monotonic()
+        DB_UP.set(1 if self.alive else 0)
+        return self.alive
+
+
+    async def close(self) -> None:
+        await self._probe.dispose()
+
+
+    async def run(self) -> None:
+        while True:
+            # while down, check more often to notice the recovery quickly
+            await asyncio.sleep(self.interval if self.alive else min(self.interval, 1.0))
+            await self.ping()
@@ -0,0 +1,99 @@
+from __future__ import annotations
+import asyncio
+from typing import Optional
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+
+class LeaderElection:
+    # Replicas race for a session-level Postgres advisory lock on a dedicated
+    # connection; whoever holds it is the leader. Server-side TCP keepalives on
+    # that connection make Postgres drop the lock within seconds of the leader
+    # host disappearing, and the leader steps down as soon as its own connection
+    # stops answering.
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        *,
+        lock_key: int,
+        retry_interval: float = 2.0,
+        check_interval: float = 2.0,
+        keepalive_idle: int = 5,
+        keepalive_interval: int = 2,
+        keepalive_count: int = 3,
+    ) -> None:
+        self.engine = engine
+        self.lock_key = lock_key
+        self.retry_interval = retry_interval
+        self.check_interval = check_interval
+        self.keepalive_idle = keepalive_idle
+        self.keepalive_interval = keepalive_interval
+        self.keepalive_count = keepalive_count
+        self._conn: Optional[AsyncConnection] = None
+
+
+    async def acquire(self) -> None:
+        announced = False
+        while True:
+            try:
+                if await self._try_lock():
+                    logger.info(f"Acquired leader lock {self.lock_key}")
+                    return
+            except Exception as ex:
+                logger.warning(f"Leader lock attempt failed: {ex}")
+                await self._drop_connection()
+            if not announced:
+                logger.info("Another replica is the leader, standing by")
+                announced = True
+            await asyncio.sleep(self.retry_interval)
+
+
+    async def watch(self) -> None:
+        # returns once leadership is lost
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                assert self._conn is not None
+                await asyncio.wait_for(self._conn.execute(text("SELECT 1")), timeout=self.check_interval)
+            except Exception as ex:
+                logger.error(f"Lost connection holding the leader lock: {ex}")
+                await self._drop_connection()
+                return
+
+
+    async def release(self) -> None:
+        if self._conn is None:
+            return
+        try:
+            await self._conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.lock_key})
+        except Exception:
+            pass
+        await self._drop_connection()
+
+
+    async def _try_lock(self) -> bool:
+        if self._conn is None:
+            conn = await self.engine.connect()
+            self._conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await self._conn.execute(text(f"SET tcp_keepalives_idle = {int(self.keepalive_idle)}"))
+            await self._conn.execute(text(f"SET tcp_keepalives_interval = {int(self.keepalive_interval)}"))
+            await self._conn.execute(text(f"SET tcp_keepalives_count = {int(self.keepalive_count)}"))
+        res = await self._conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.lock_key})
+        return bool(res.scalar())
+
+
+    async def _drop_connection(self) -> None:
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        try:
+            await conn.invalidate()
+        except Exception:
+            pass
+        try:
+            await conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,185 @@
+from __future__ import annotations
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional, Union
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from .models import Member, MemberRole
+from .session_hooks import on_commit
+
+
+@dataclass(frozen=True, slots=True)
+class MemberRecord:
+    id: UUID
+    tg_user_id: int
+    user_name: str
+    first_name: str
+    last_name: str
+    role: MemberRole
+    bio: str
+
+
+    @classmethod
+    def from_model(cls, member: Member) -> MemberRecord:
+        return cls(
+            id=member.id,
+            tg_user_id=member.tg_user_id,
+            user_name=member.user_name,
+            first_name=member.first_name,
+            last_name=member.last_name,
+            role=member.role,
+            bio=member.bio,
+        )
+
+
+# "known not to be a member" is cached as well, /apply from outsiders is the common miss
+_ABSENT = object()
+_Entry = tuple[Union[MemberRecord, object], float]
+
+
+class MemberCache:
+    def __init__(self, *, ttl_seconds: float = 300.0, max_size: int = 10_000) -> None:
+        self.ttl = ttl_seconds
+        self.max_size = max_size
+        self._by_tg_id: OrderedDict[int, _Entry] = OrderedDict()
+        self._tg_id_by_username: dict[str, int] = {}
+        self._tg_id_by_member_id: dict[UUID, int] = {}
+        # bumped on every invalidation so that a read which raced with a write
+        # does not put the value it fetched before the write back into the cache
+        self._generation = 0
+        # how stale a replica read may be; writes are invalidated once more after it
+        self.stale_window = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+    def configure(self, *, ttl_seconds: float, max_size: int, stale_window: float = 0.0) -> None:
+        self.ttl = ttl_seconds
+        self.max_size = max_size
+        self.stale_window = stale_window
+        self.clear()
+
+
+    def generation(self) -> int:
+        return self._generation
+
+
+    def _lookup(self, tg_user_id: int) -> tuple[bool, Optional[MemberRecord]]:
+        entry = self._by_tg_id.get(tg_user_id)
+        if entry is None:
+            return False, None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            self._drop(tg_user_id)
+            return False, None
+        self._by_tg_id.move_to_end(tg_user_id)
+        return True, None if value is _ABSENT else value  # type: ignore[return-value]
+
+
+    def get_by_tg_user_id(self, tg_user_id: int) -> tuple[bool, Optional[MemberRecord]]:
+        found, record = self._lookup(tg_user_id)
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return found, record
+
+
+    def get_by_username(self, username: str) -> Optional[MemberRecord]:
+        tg_user_id = self._tg_id_by_username.get(username)
+        record = None if tg_user_id is None else self._lookup(tg_user_id)[1]
+        if record is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return record
+
+
+    def put(self, record: MemberRecord, generation: int) -> None:
+        if generation != self._generation:
+            return
+        self._drop(record.tg_user_id)
+        self._by_tg_id[record.tg_user_id] = (record, time.monotonic() + self.ttl)
+        self._tg_id_by_username[record.user_name] = record.tg_user_id
+        self._tg_id_by_member_id[record.id] = record.tg_user_id
+        self._evict_overflow()
+
+
+    def put_absent(self, tg_user_id: int, generation: int) -> None:
+        if generation != self._generation:
+            return
+        self._drop(tg_user_id)
+        self._by_tg_id[tg_user_id] = (_ABSENT, time.monotonic() + self.ttl)
+        self._evict_overflow()
+
+
+    def invalidate(
+        self,
+        *,
+        tg_user_id: Optional[int] = None,
+        username: Optional[str] = None,
+        member_id: Optional[UUID] = None,
+    ) -> None:
+        self._generation += 1
+        if username is not None:
+            self._drop(self._tg_id_by_username.get(username))
+        if member_id is not None:
+            self._drop(self._tg_id_by_member_id.get(member_id))
+        self._drop(tg_user_id)
+
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._by_tg_id.clear()
+        self._tg_id_by_username.clear()
+        self._tg_id_by_member_id.clear()
+
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._by_tg_id),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+    def _drop(self, tg_user_id: Optional[int]) -> None:
+        if tg_user_id is None:
+            return
+        entry = self._by_tg_id.pop(tg_user_id, None)
+        if entry is None or entry[0] is _ABSENT:
+            return
+        record: MemberRecord = entry[0]  # type: ignore[assignment]
+        if self._tg_id_by_username.get(record.user_name) == tg_user_id:
+            del self._tg_id_by_username[record.user_name]
+        self._tg_id_by_member_id.pop(record.id, None)
+
+
+    def _evict_overflow(self) -> None:
+        while len(self._by_tg_id) > self.max_size:
+            oldest = next(iter(self._by_tg_id))
+            self._drop(oldest)
+            self.evictions += 1
+
+
+member_cache = MemberCache()
+
+
+def invalidate_on_commit(session: Session, **keys: Any) -> None:
+    # drop the entry right away and once more after the commit, so that readers in
+    # other sessions cannot re-cache the row as it was before the transaction
+    member_cache.invalidate(**keys)
+    on_commit(session, lambda: _invalidate_committed(keys))
+
+
+def _invalidate_committed(keys: dict[str, Any]) -> None:
+    member_cache.invalidate(**keys)
+    if member_cache.stale_window > 0:
+        # a lagging replica can still serve the old row until then
+        asyncio.get_running_loop().call_later(member_cache.stale_window, lambda: member_cache.invalidate(**keys))
@@ -0,0 +1,114 @@
+from __future__ import annotations
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Optional
+from uuid import UUID
+
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .member_cache import MemberRecord
+from .models import Member
+
+
+def _terms(record: MemberRecord) -> set[str]:
+    full_name = f"{record.first_name} {record.last_name}".strip()
+    terms = {record.user_name, record.first_name, record.last_name, full_name}
+    return {t.lower() for t in terms if t}
+
+
+class MemberPrefixIndex:
+    # Sorted (term, tg_user_id) pairs kept in two parallel containers: a list of
+    # lowercased terms and an int64 array of owners, so a prefix lookup is one
+    # bisect plus a scan over the matching run.
+    __slots__ = ("_terms", "_owners", "_members", "_tg_id_by_member_id")
+
+
+    def __init__(self) -> None:
+        self._terms: list[str] = []
+        self._owners = array("q")
+        self._members: dict[int, MemberRecord] = {}
+        self._tg_id_by_member_id: dict[UUID, int] = {}
+
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+
+    def build(self, records: Iterable[MemberRecord]) -> None:
+        members = {r.tg_user_id: r for r in records}
+        pairs = sorted((term, tg_id) for tg_id, r in members.items() for term in _terms(r))
+        self._terms = [term for term, _ in pairs]
+        self._owners = array("q", (tg_id for _, tg_id in pairs))
+        self._members = members
+        self._tg_id_by_member_id = {r.id: tg_id for tg_id, r in members.items()}
+
+
+    async def load(self, session_factory: async_sessionmaker[AsyncSession]) -> None:
+        async with session_factory() as session:
+            res = await session.execute(select(Member))
+            self.build(MemberRecord.from_model(m) for m in res.scalars())
+        logger.info(f"Member directory index built: {len(self)} members, {len(self._terms)} terms")
+
+
+    def upsert(self, record: MemberRecord) -> None:
+        self.remove(record.tg_user_id)
+        for term in _terms(record):
+            pos = self._position(term, record.tg_user_id)
+            self._terms.insert(pos, term)
+            self._owners.insert(pos, record.tg_user_id)
+        self._members[record.tg_user_id] = record
+        self._tg_id_by_member_id[record.id] = record.tg_user_id
+
+
+    def remove(self, tg_user_id: int) -> None:
+        record = self._members.pop(tg_user_id, None)
+        if record is None:
+            return
+        self._tg_id_by_member_id.pop(record.id, None)
+        for term in _terms(record):
+            pos = self._position(term, tg_user_id)
+            if pos < len(self._terms) and self._terms[pos] == term and self._owners[pos] == tg_user_id:
+                del self._terms[pos]
+                del self._owners[pos]
+
+
+    def remove_by_member_id(self, member_id: UUID) -> None:
+        tg_user_id = self._tg_id_by_member_id.get(member_id)
+        if tg_user_id is not None:
+            self.remove(tg_user_id)
+
+
+    def search(
+        self,
+        query: str,
+        *,
+        offset: int = 0,
+        limit: int = 20,
+    ) -> tuple[list[MemberRecord], Optional[int]]:
+        # returns one page of members and the offset of the next page, if any
+        prefix = query.strip().lstrip("@").lower()
+        wanted = offset + limit + 1
+        seen: dict[int, None] = {}
+        pos = bisect_left(self._terms, prefix)
+        while pos < len(self._terms) and len(seen) < wanted:
+            if not self._terms[pos].startswith(prefix):
+                break
+            seen.setdefault(self._owners[pos])
+            pos += 1
+
+        owners = list(seen)
+        page = [self._members[tg_id] for tg_id in owners[offset:offset + limit]]
+        next_offset = offset + limit if len(owners) > offset + limit else None
+        return page, next_offset
+
+
+    def _position(self, term: str, tg_user_id: int) -> int:
+        pos = bisect_left(self._terms, term)
+        while pos < len(self._terms) and self._terms[pos] == term and self._owners[pos] < tg_user_id:
+            pos += 1
+        return pos
+
+
+member_index = MemberPrefixIndex()
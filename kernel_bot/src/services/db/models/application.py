@@ -4,11 +4,23 @@ from .base_model import *
 
 class Application(Base):
     __tablename__ = "applications"
+    __table_args__ = (
+        # at most one pending application per user, also the ON CONFLICT target
+        # of ApplicationDAO.get_or_create_pending
+        Index(
+            "uq_applications_pending_tg_user_id",
+            "tg_user_id",
+            unique=True,
+            postgresql_where=text("status = 'pending'"),
+        ),
+    )
 
     id: Mapped[UUIDpk]
     tg_user_id: Mapped[int] = mapped_column(BigInteger, index=True)
     status: Mapped[ApplicationStatus] = mapped_column(default=ApplicationStatus.pending)
-    invite_id: Mapped[str] = mapped_column(UUID(as_uuid=True), default=uuid4)
+    invite_id: Mapped["UUID | None"] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("invites.id", ondelete="SET NULL"), nullable=True
+    )
     invite: Mapped["Invite | None"] = relationship(back_populates="application")
 
     created_at: Mapped[created_at]
@@ -1,6 +1,5 @@
 from typing import Annotated
 from uuid import UUID, uuid4
-import bcrypt
 from loguru import logger
 
 from sqlalchemy import (
@@ -10,6 +9,7 @@ from sqlalchemy import (
     Enum as SQLEnum,
     Float,
     ForeignKey,
+    Index,
     Integer,
     Numeric,
     String,
@@ -24,7 +24,7 @@ from sqlalchemy import (
 
 from enum import Enum as PyEnum
 
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -67,6 +67,12 @@ class MemberRole(str, PyEnum):
 class ApplicationStatus(str, PyEnum):
     pending = "pending"
     approved = "approved"
+
+
+class OutboxStatus(str, PyEnum):
+    pending = "pending"
+    sent = "sent"
+    failed = "failed"
     
     
 
@@ -0,0 +1,12 @@
+from __future__ import annotations
+from .base_model import *
+
+
+class FsmState(Base):
+    __tablename__ = "fsm_states"
+
+    key: Mapped[str] = mapped_column(String(256), primary_key=True)
+    state: Mapped["str | None"] = mapped_column(String(256), nullable=True)
+    data: Mapped[dict] = mapped_column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
+
+    updated_at: Mapped[updated_at]
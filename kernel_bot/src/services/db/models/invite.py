@@ -4,11 +4,16 @@ from .base_model import *
 
 class Invite(Base):
     __tablename__ = "invites"
+    __table_args__ = (
+        # only live links are ever looked up by expiry (the sweeper, the pool)
+        Index("ix_invites_live_expire_at", "expire_at", postgresql_where=text("NOT is_revoked")),
+    )
 
     id: Mapped[UUIDpk]
     chat_id: Mapped[int] = mapped_column(BigInteger, index=True)
     invite_link: Mapped[str] = mapped_column(String(256), unique=True)
-    intended_user_id: Mapped[int] = mapped_column(BigInteger, index=True)
+    # NULL while the link sits unassigned in the prewarmed pool
+    intended_user_id: Mapped["int | None"] = mapped_column(BigInteger, index=True, nullable=True)
     expire_at: Mapped[UnixTs]
     member_limit: Mapped[int] = mapped_column(Integer, default=1)
     creates_join_request: Mapped[bool] = mapped_column(Boolean, default=True)
@@ -0,0 +1,24 @@
+from __future__ import annotations
+from .base_model import *
+
+
+class OutboxMessage(Base):
+    __tablename__ = "outbox"
+    __table_args__ = (
+        Index(
+            "ix_outbox_pending_next_attempt_at",
+            "next_attempt_at",
+            postgresql_where=text("status = 'pending'"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    method: Mapped[str] = mapped_column(String(64), nullable=False)  # aiogram Bot method name
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    status: Mapped[OutboxStatus] = mapped_column(default=OutboxStatus.pending)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    next_attempt_at: Mapped[created_at]
+    last_error: Mapped["str | None"] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[created_at]
+    updated_at: Mapped[updated_at]
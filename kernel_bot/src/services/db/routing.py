@@ -0,0 +1,91 @@
+from __future__ import annotations
+import asyncio
+import time
+from typing import Any, Optional
+
+from loguru import logger
+from sqlalchemy import Select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+
+
+# statements opt in with .execution_options(**READ_REPLICA)
+READ_REPLICA = {"read_replica": True}
+
+_WROTE_KEY = "routing_wrote"
+
+_LAG_SQL = text(
+    "SELECT CASE"
+    " WHEN NOT pg_is_in_recovery() THEN 0"
+    " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+    " END"
+)
+
+
+class ReplicaRouter:
+    # Tracks how far the replica is behind, measured in the background, so that
+    # picking an engine at query time is a couple of attribute reads.
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        *,
+        max_lag_seconds: float = 5.0,
+        check_interval: float = 2.0,
+    ) -> None:
+        self.engine = engine
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self.lag: Optional[float] = None
+        self._checked_at = 0.0
+
+
+    def usable(self) -> bool:
+        # a measurement older than a few intervals means the monitor is stuck
+        fresh = time.monotonic() - self._checked_at < self.check_interval * 3
+        return fresh and self.lag is not None and self.lag <= self.max_lag_seconds
+
+
+    async def check(self) -> None:
+        try:
+            async with self.engine.connect() as conn:
+                lag = float((await conn.execute(_LAG_SQL)).scalar_one())
+        except Exception as ex:
+            if self.lag is not None:
+                logger.warning(f"Read replica is unreachable, reading from primary: {ex}")
+            self.lag = None
+            return
+
+        if lag > self.max_lag_seconds and (self.lag is None or self.lag <= self.max_lag_seconds):
+            logger.warning(f"Read replica is {lag:.1f}s behind, reading from primary")
+        self.lag = lag
+        self._checked_at = time.monotonic()
+
+
+    async def run(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(self.check_interval)
+
+
+class RoutingSession(Session):
+    # Sends SELECTs marked with READ_REPLICA to the replica while it is fresh
+    # enough. Once the session has written anything, everything stays on the
+    # primary so the session reads its own writes.
+    def __init__(self, *args: Any, replica: Optional[ReplicaRouter] = None, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.replica = replica
+
+
+    def get_bind(self, mapper: Any = None, clause: Any = None, **kw: Any) -> Engine:  # type: ignore[override]
+        if not isinstance(clause, Select):
+            self.info[_WROTE_KEY] = True
+        elif (
+            self.replica is not None
+            and not self.info.get(_WROTE_KEY)
+            and clause.get_execution_options().get("read_replica")
+            and self.replica.usable()
+        ):
+            return self.replica.engine.sync_engine
+        return super().get_bind(mapper, clause=clause, **kw)
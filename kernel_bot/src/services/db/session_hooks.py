@@ -0,0 +1,24 @@
+from __future__ import annotations
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+_CALLBACKS_KEY = "after_commit_callbacks"
+
+
+def on_commit(session: Session, callback: Callable[[], None]) -> None:
+    # runs `callback` once the surrounding transaction is committed, dropped on rollback
+    session.info.setdefault(_CALLBACKS_KEY, []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_callbacks(session: Session) -> None:
+    for callback in session.info.pop(_CALLBACKS_KEY, ()):
+        callback()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_callbacks(session: Session) -> None:
+    session.info.pop(_CALLBACKS_KEY, None)
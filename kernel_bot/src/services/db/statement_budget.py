@@ -0,0 +1,126 @@
+from __future__ import annotations
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Iterator, Optional
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject, Update
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+@dataclass(slots=True)
+class StatementStats:
+    handler: str = "-"
+    statements: int = 0
+    db_time: float = 0.0
+    by_sql: Counter[str] = field(default_factory=Counter)
+
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        return [(sql, n) for sql, n in self.by_sql.most_common() if n >= threshold]
+
+
+_current: ContextVar[Optional[StatementStats]] = ContextVar("statement_stats", default=None)
+_STARTED_KEY = "statement_started_at"
+
+
+def _before_cursor_execute(conn: Connection, cursor: Any, statement: str, *args: Any) -> None:
+    if _current.get() is not None:
+        conn.info.setdefault(_STARTED_KEY, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn: Connection, cursor: Any, statement: str, *args: Any) -> None:
+    stats = _current.get()
+    started = conn.info.get(_STARTED_KEY)
+    if stats is None or not started:
+        return
+    stats.statements += 1
+    stats.db_time += time.perf_counter() - started.pop()
+    stats.by_sql[statement] += 1
+
+
+def install(engine: AsyncEngine) -> None:
+    # statements are only counted while a StatementStats is active in the context,
+    # background jobs do not pay for it
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class StatementBudgetMiddleware(BaseMiddleware):
+    # dp.update outer middleware: logs updates that ran more SQL statements than
+    # the budget, and the same statement `repeat_threshold` times (likely N+1)
+    def __init__(self, *, max_statements: int = 5, repeat_threshold: int = 3) -> None:
+        self.max_statements = max_statements
+        self.repeat_threshold = repeat_threshold
+
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        stats = StatementStats()
+        token = _current.set(stats)
+        try:
+            return await handler(event, data)
+        finally:
+            _current.reset(token)
+            self._report(event, stats)
+
+
+    def _report(self, event: TelegramObject, stats: StatementStats) -> None:
+        update_id = event.update_id if isinstance(event, Update) else "-"
+        if stats.statements > self.max_statements:
+            logger.warning(
+                f"Update {update_id} ({stats.handler}) ran {stats.statements} SQL statements "
+                f"in {stats.db_time * 1000:.1f} ms, budget is {self.max_statements}"
+            )
+        for sql, n in stats.repeated(self.repeat_threshold):
+            logger.warning(f"Update {update_id} ({stats.handler}) ran the same statement {n} times: {sql[:200]}")
+
+
+class _HandlerNameMiddleware(BaseMiddleware):
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        stats = _current.get()
+        if stats is not None:
+            stats.handler = f"{data['event_router'].name}.{getattr(data['handler'].callback, '__name__', 'unknown')}"
+        return await handler(event, data)
+
+
+def instrument_dispatcher(dp: Dispatcher, budget: StatementBudgetMiddleware) -> None:
+    # call before UpdateSessionMiddleware is registered, so the statements of its
+    # final commit (flushed inserts and updates) are counted too
+    dp.update.outer_middleware(budget)
+    names = _HandlerNameMiddleware()
+    for name, observer in dp.observers.items():
+        if name not in ("update", "error"):
+            observer.middleware(names)
+
+
+@contextmanager
+def assert_max_statements(limit: int) -> Iterator[StatementStats]:
+    # for tests and local checks:
+    #     with assert_max_statements(3):
+    #         await cmd_apply(message, session=session, deps=deps)
+    # the engine must have gone through install()
+    stats = StatementStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+    if stats.statements > limit:
+        listing = "\n".join(f"  {n}x {sql}" for sql, n in stats.by_sql.most_common())
+        raise AssertionError(f"Expected at most {limit} SQL statements, {stats.statements} were run:\n{listing}")
@@ -0,0 +1,81 @@
+from __future__ import annotations
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Optional
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+from aiogram.types import TelegramObject
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import ORMExecuteState, Session
+
+
+_current_session: ContextVar[Optional[AsyncSession]] = ContextVar("update_session", default=None)
+_WROTE_KEY = "update_session_wrote"
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_statement(state: ORMExecuteState) -> None:
+    # anything but a SELECT (DML, text()) counts as a write
+    if not state.is_select:
+        state.session.info[_WROTE_KEY] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _note_flush(session: Session, flush_context: Any) -> None:
+    session.info[_WROTE_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _forget_writes(session: Session) -> None:
+    session.info.pop(_WROTE_KEY, None)
+
+
+class UpdateSessionMiddleware(BaseMiddleware):
+    # One AsyncSession per update, handed to handlers as `session`. It checks out
+    # a pooled connection only on the first query, is committed once after the
+    # handler returns and is rolled back by close() when the handler raises.
+    # Handlers that reply after writing commit themselves before the reply (or
+    # send it through the outbox); the commit here then has nothing left to do.
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession]) -> None:
+        self.session_factory = session_factory
+
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        session = self.session_factory()
+        token = _current_session.set(session)
+        data["session"] = session
+        try:
+            result = await handler(event, data)
+            if session.in_transaction():
+                await session.commit()
+            return result
+        finally:
+            _current_session.reset(token)
+            await session.close()
+
+
+class ReleaseConnectionMiddleware(BaseRequestMiddleware):
+    # Ends the current update's transaction before a Bot API call when it has only
+    # read so far, so a pooled connection is not parked across a slow outbound
+    # request. Nothing is committed on the handler's behalf: a transaction with
+    # writes stays open until the handler commits or fails.
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        session = _current_session.get()
+        if session is not None and session.in_transaction() and not session.info.get(_WROTE_KEY):
+            # commit, not rollback: a rollback would expire the loaded objects
+            await session.commit()
+        return await make_request(bot, method)
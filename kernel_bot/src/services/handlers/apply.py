@@ -1,23 +1,16 @@
 from __future__ import annotations
-from aiogram import Router, Bot
+from aiogram import Router
 from aiogram.filters import Command
 from aiogram.enums import ChatType
 from aiogram.types import Message, InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.markdown import hbold, hlink, hcode
-
-from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.texts.texts import WELCOME_TEXT
-from src.services.db.data_access_module import get_member, get_pending_app, create_app
+from src.services.db.data_access_module import enqueue_telegram_call, get_member, get_or_create_pending_app
 from .main_handler import HandlerDeps
 
 router = Router(name="apply")
-_deps: HandlerDeps
-
-
-def setup(deps: HandlerDeps) -> None:
-    global _deps
-    _deps = deps
 
 
 @router.message(Command("start"))
@@ -28,37 +21,40 @@ async def cmd_start(message: Message) -> None:
 
 
 @router.message(Command("apply"))
-async def cmd_apply(message: Message, bot: Bot) -> None:
+async def cmd_apply(message: Message, session: AsyncSession, deps: HandlerDeps) -> None:
     if message.chat.type != ChatType.PRIVATE:
         return
 
-    async with _deps.session_factory() as session:
-        member = await get_member(session, message.from_user.id)
-        if member is not None:
-            await message.answer("Вы уже участник { K E R N E L }.")
-            return
+    member = await get_member(session, message.from_user.id)
+    if member is not None:
+        await message.answer("Вы уже участник { K E R N E L }.")
+        return
 
-        app = await get_pending_app(session, message.from_user.id)
-        if app is None:
-            app = await create_app(session, message.from_user.id)
-            await session.commit()
+    app, created = await get_or_create_pending_app(session, message.from_user.id)
+    if not created:
+        await message.answer("Ваша заявка уже на рассмотрении. Ожидайте решения администратора.")
+        return
 
-        user_link = hlink(message.from_user.full_name, f"tg://user?id={message.from_user.id}")
-        text = (
-            f"Новая заявка в {hbold('{ K E R N E L }')}\n"
-            f"Пользователь: {user_link}\n"
-            f"username: {hcode('@' + message.from_user.username) if message.from_user.username else '—'}\n"
-            f"id: {message.from_user.id}\n\n"
-            f"Что сделать с заявкой?"
-        )
+    user_link = hlink(message.from_user.full_name, f"tg://user?id={message.from_user.id}")
+    text = (
+        f"Новая заявка в {hbold('{ K E R N E L }')}\n"
+        f"Пользователь: {user_link}\n"
+        f"username: {hcode('@' + message.from_user.username) if message.from_user.username else '—'}\n"
+        f"id: {message.from_user.id}\n\n"
+        f"Что сделать с заявкой?"
+    )
 
-        await bot.send_message(
-            chat_id=_deps.admin_user_id,
-            text=text,
-            reply_markup=_kb_yes_no(str(app.id)),
-            disable_web_page_preview=True,
-        )
-        await message.answer("Заявка создана и отправлена на модерацию. Ожидайте решения администратора.")
+    # the admin is notified through the outbox, atomically with the application
+    await enqueue_telegram_call(
+        session,
+        "send_message",
+        chat_id=deps.admin_user_id,
+        text=text,
+        reply_markup=_kb_yes_no(str(app.id)).model_dump(mode="json", exclude_none=True),
+        disable_web_page_preview=True,
+    )
+    await session.commit()
+    await message.answer("Заявка создана и отправлена на модерацию. Ожидайте решения администратора.")
 
 
 def _kb_yes_no(app_id: str) -> InlineKeyboardMarkup:
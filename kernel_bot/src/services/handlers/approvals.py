@@ -3,56 +3,52 @@ import uuid
 from aiogram import Router, Bot, F
 from aiogram.types import CallbackQuery
 from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.core.utils import TimeTools
 from src.services.db.models import Application
-from src.services.db.data_access_module import create_personal_invite, approve_app
+from src.services.db.data_access_module import take_personal_invite, approve_app, enqueue_telegram_call
 from .main_handler import HandlerDeps
 
 router = Router(name="approvals")
-_deps: HandlerDeps
-
-
-def setup(deps: HandlerDeps) -> None:
-    global _deps
-    _deps = deps
 
 
 @router.callback_query(F.data.startswith("approve:"))
-async def cb_approve(call: CallbackQuery, bot: Bot) -> None:
+async def cb_approve(call: CallbackQuery, bot: Bot, session: AsyncSession, deps: HandlerDeps) -> None:
     app_id = uuid.UUID(call.data.split(":", 1)[1])
 
-    async with _deps.session_factory() as session:
-        res = await session.execute(select(Application).where(Application.id == app_id))
-        app = res.scalar_one_or_none()
-        if app is None:
-            await call.answer("Заявка не найдена", show_alert=True)
-            return
-
-        inv = await create_personal_invite(
-            session,
-            bot=bot,
-            chat_id=_deps.group_chat_id,
-            intended_user_id=app.tg_user_id,
-        )
-        link_str = inv.invite_link
-        await approve_app(session, app, inv.id)
-        await session.commit()
-
-    await bot.send_message(
-        app.tg_user_id,
+    res = await session.execute(select(Application).where(Application.id == app_id))
+    app = res.scalar_one_or_none()
+    if app is None:
+        await call.answer("Заявка не найдена", show_alert=True)
+        return
+
+    inv = await take_personal_invite(
+        session,
+        bot=bot,
+        chat_id=deps.group_chat_id,
+        intended_user_id=app.tg_user_id,
+        min_remaining_seconds=deps.invite_min_remaining_seconds,
+    )
+    await approve_app(session, app, inv.id)
+    await enqueue_telegram_call(
+        session,
+        "send_message",
+        chat_id=app.tg_user_id,
         text=(
-            "Ваша персональная ссылка на вступление в { K E R N E L } (24 часа, одноразовая).\n\n"
-            f"{link_str}\n\n"
+            "Ваша персональная ссылка на вступление в { K E R N E L } "
+            f"(одноразовая, действует до {TimeTools.from_time_stamp(inv.expire_at):%d.%m.%Y %H:%M %Z}).\n\n"
+            f"{inv.invite_link}\n\n"
             "Важно: это join-request — нажмите «Запросить вступление»."
         ),
     )
+    await session.commit()
     await call.answer("Одобрено")
 
 
 @router.callback_query(F.data.startswith("deny:"))
-async def cb_deny(call: CallbackQuery) -> None:
+async def cb_deny(call: CallbackQuery, session: AsyncSession) -> None:
     app_id = uuid.UUID(call.data.split(":", 1)[1])
-    async with _deps.session_factory() as session:
-        await session.execute(delete(Application).where(Application.id == app_id))
-        await session.commit()
+    await session.execute(delete(Application).where(Application.id == app_id))
+    await session.commit()
     await call.answer("Отклонено")
@@ -4,21 +4,15 @@ from aiogram.filters import Command
 from aiogram.enums import ChatType
 from aiogram.types import Message
 from aiogram.utils.markdown import hbold
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.services.db.data_access_module import member_by_username
-from .main_handler import HandlerDeps
 
 router = Router(name="look_bio")
-_deps: HandlerDeps
-
-
-def setup(deps: HandlerDeps) -> None:
-    global _deps
-    _deps = deps
 
 
 @router.message(Command("look_bio"))
-async def cmd_look_bio(message: Message) -> None:
+async def cmd_look_bio(message: Message, session: AsyncSession) -> None:
     if message.chat.type != ChatType.PRIVATE:
         return
 
@@ -29,12 +23,11 @@ async def cmd_look_bio(message: Message) -> None:
         return
 
     username = raw.lstrip("@")
-    async with _deps.session_factory() as session:
-        m = await member_by_username(session, username)
-        if m is None:
-            await message.answer("Участник не найден в базе.")
-            return
+    m = await member_by_username(session, username)
+    if m is None:
+        await message.answer("Участник не найден в базе.")
+        return
 
-        name = " ".join(x for x in [m.first_name, m.last_name] if x)
-        text = f"{hbold(name or '@' + username)}\nusername: @{m.username or username}\n\n{m.bio or '—'}"
-        await message.answer(text)
+    name = " ".join(x for x in [m.first_name, m.last_name] if x)
+    text = f"{hbold(name or '@' + username)}\nusername: @{m.user_name or username}\n\n{m.bio or '—'}"
+    await message.answer(text)
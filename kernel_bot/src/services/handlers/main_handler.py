@@ -1,9 +1,12 @@
 from __future__ import annotations
+import hashlib
 import logging
+import os
 from dataclasses import dataclass
-from typing import Iterable
+from typing import Callable, Iterable, Optional
 
 from aiogram import Dispatcher, Router, Bot, F
+from aiogram.fsm.storage.base import BaseStorage
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import (
     BotCommand,
@@ -13,12 +16,16 @@ from aiogram.types import (
 from aiogram.types.error_event import ErrorEvent
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
+from src.core.shutdown import in_flight
+from src.services.db.update_session import UpdateSessionMiddleware
+
 
 @dataclass(frozen=True)
 class HandlerDeps:
     session_factory: async_sessionmaker[AsyncSession]
     group_chat_id: int
     admin_user_id: int
+    invite_min_remaining_seconds: int = 12 * 60 * 60
 
 
 class MainHandler:
@@ -26,13 +33,11 @@ class MainHandler:
         self.main_router = Router(name="root")
         
 
-    def include_command_routers(self, deps: HandlerDeps) -> None:
-        from . import apply, approvals, on_left_member, join_request, setbio, look_bio
-        command_modules = (apply, approvals, on_left_member, join_request, setbio, look_bio)
+    def include_command_routers(self) -> None:
+        from . import apply, approvals, on_left_member, join_request, setbio, look_bio, member_directory
+        command_modules = (apply, approvals, on_left_member, join_request, setbio, look_bio, member_directory)
 
         for m in command_modules:
-            if hasattr(m, "setup"):
-                m.setup(deps)
             self.main_router.include_router(m.router)
 
 
@@ -43,9 +48,12 @@ class MainHandler:
         async def unknown_command(msg: Message) -> None:
             await msg.answer("Неизвестная команда. Открой /help или напиши /apply.")
 
-        @root_router.errors()
-        async def on_error(event: ErrorEvent) -> None:
+        @self.main_router.errors()
+        async def on_error(event: ErrorEvent, inbox_errors: Optional[list[Exception]] = None) -> None:
             logging.exception("Unhandled error in handler", exc_info=event.exception)
+            if inbox_errors is not None:
+                # fed by an inbox worker, which retries the update instead of marking it processed
+                inbox_errors.append(event.exception)
             upd = event.update
             if isinstance(upd, Message):
                 try:
@@ -53,26 +61,70 @@ class MainHandler:
                 except Exception:
                     pass
 
-        root_router.include_router(fallback) 
+        self.main_router.include_router(fallback)
+
+
+    COMMANDS = (
+        BotCommand(command="apply",  description="Подать заявку на вступление"),
+        BotCommand(command="setbio", description="Задать описание о себе"),
+        BotCommand(command="look_bio",  description="Посмотреть описание участника"),
+        BotCommand(command="help",   description="Справка"),
+    )
+
 
+    @classmethod
+    def commands_hash(cls, bot_id: int) -> str:
+        scope = BotCommandScopeAllPrivateChats()
+        parts = [str(bot_id), scope.model_dump_json(), *(c.model_dump_json() for c in cls.COMMANDS)]
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+    async def setup_bot_commands(self, bot: Bot, *, cache_path: Optional[str] = None) -> bool:
+        # set_my_commands is skipped while the hash in cache_path matches; returns
+        # whether the commands were sent
+        digest = self.commands_hash(bot.id)
+        if cache_path:
+            try:
+                with open(cache_path, encoding="utf-8") as file:
+                    if file.read().strip() == digest:
+                        logging.debug("Bot commands are unchanged, not sending them")
+                        return False
+            except OSError:
+                pass
 
-    async def setup_bot_commands(self, bot: Bot) -> None:
         await bot.set_my_commands(
-            commands=[
-                BotCommand(command="apply",  description="Подать заявку на вступление"),
-                BotCommand(command="setbio", description="Задать описание о себе"),
-                BotCommand(command="look_bio",  description="Посмотреть описание участника"),
-                BotCommand(command="help",   description="Справка"),
-            ],
+            commands=list(self.COMMANDS),
             scope=BotCommandScopeAllPrivateChats(),
         )
-
-
-    def make_dispatcher(self, *, deps: HandlerDeps) -> Dispatcher:
-        dp = Dispatcher(storage=MemoryStorage())
-        self.include_command_routers(deps)
+        if cache_path:
+            try:
+                os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+                with open(cache_path, "w", encoding="utf-8") as file:
+                    file.write(digest)
+            except OSError as ex:
+                logging.warning("Could not cache the bot commands hash in %s: %s", cache_path, ex)
+        return True
+
+
+    def make_dispatcher(
+        self,
+        *,
+        deps: HandlerDeps,
+        storage: BaseStorage | None = None,
+        instrument: Iterable[Callable[[Dispatcher], None]] = (),
+    ) -> Dispatcher:
+        # handlers get `deps` from the workflow data and a per-update `session`
+        dp = Dispatcher(storage=storage or MemoryStorage(), deps=deps)
+        # ahead of the session middleware, an update counts as handled once it is committed
+        dp.update.outer_middleware(in_flight)
+        # `instrument` hooks register their update middlewares around the session
+        # middleware, so they see its commit
+        for hook in instrument:
+            hook(dp)
+        dp.update.outer_middleware(UpdateSessionMiddleware(deps.session_factory))
+        self.include_command_routers()
         self.attach_fallbacks()
-        dp.include_router(root_router)
+        dp.include_router(self.main_router)
         return dp
 
 
@@ -0,0 +1,50 @@
+from __future__ import annotations
+from aiogram import Router
+from aiogram.enums import ParseMode
+from aiogram.types import InlineQuery, InlineQueryResultArticle, InputTextMessageContent
+from aiogram.utils.markdown import hbold
+from aiogram.utils.text_decorations import html_decoration
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.services.db.data_access_module import get_member
+from src.services.db.member_index import member_index
+
+router = Router(name="member_directory")
+
+PAGE_SIZE = 20
+
+
+@router.inline_query()
+async def on_inline_query(query: InlineQuery, session: AsyncSession) -> None:
+    # the directory is for members only and is never listed without a prefix
+    prefix = query.query.strip().lstrip("@")
+    if not prefix or await get_member(session, query.from_user.id) is None:
+        await query.answer([], cache_time=30, is_personal=True)
+        return
+
+    offset = int(query.offset) if query.offset.isdigit() else 0
+    members, next_offset = member_index.search(prefix, offset=offset, limit=PAGE_SIZE)
+
+    results = []
+    for m in members:
+        name = " ".join(x for x in [m.first_name, m.last_name] if x) or f"@{m.user_name}"
+        username = f"@{m.user_name}" if m.user_name else "—"
+        bio = m.bio or "—"
+        results.append(
+            InlineQueryResultArticle(
+                id=str(m.tg_user_id),
+                title=name,
+                description=f"{username} · {bio[:64]}",
+                input_message_content=InputTextMessageContent(
+                    message_text=f"{hbold(name)}\nusername: {html_decoration.quote(username)}\n\n{html_decoration.quote(bio)}",
+                    parse_mode=ParseMode.HTML,
+                ),
+            )
+        )
+
+    await query.answer(
+        results,
+        cache_time=30,
+        is_personal=True,
+        next_offset=str(next_offset) if next_offset is not None else "",
+    )
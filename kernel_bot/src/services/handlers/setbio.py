@@ -3,21 +3,15 @@ from aiogram import Router
 from aiogram.filters import Command
 from aiogram.enums import ChatType
 from aiogram.types import Message
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.services.db.data_access_module import upsert_member
-from .main_handler import HandlerDeps
+from src.services.db.data_access_module import set_member_bio, upsert_member
 
 router = Router(name="setbio")
-_deps: HandlerDeps
-
-
-def setup(deps: HandlerDeps) -> None:
-    global _deps
-    _deps = deps
 
 
 @router.message(Command("setbio"))
-async def cmd_setbio(message: Message) -> None:
+async def cmd_setbio(message: Message, session: AsyncSession) -> None:
     if message.chat.type != ChatType.PRIVATE:
         return
 
@@ -27,15 +21,14 @@ async def cmd_setbio(message: Message) -> None:
         await message.answer("Используйте: /setbio <текст описания>")
         return
 
-    async with _deps.session_factory() as session:
-        m = await upsert_member(
-            session,
-            tg_user_id=message.from_user.id,
-            username=message.from_user.username,
-            first_name=message.from_user.first_name,
-            last_name=message.from_user.last_name,
-        )
-        m.bio = bio[:4000]
-        await session.commit()
-
+    m = await upsert_member(
+        session,
+        tg_user_id=message.from_user.id,
+        username=message.from_user.username,
+        first_name=message.from_user.first_name,
+        last_name=message.from_user.last_name,
+    )
+    await set_member_bio(session, m, bio[:4000])
+    # the reply confirms a saved bio
+    await session.commit()
     await message.answer("Описание сохранено.")
@@ -0,0 +1,53 @@
+from __future__ import annotations
+import asyncio
+from typing import Optional
+
+from aiogram import Bot
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.services.db.data_access_module import InboxDAO
+
+
+class InboxPoller:
+    # Long-polls getUpdates and only persists what it receives; the offset is
+    # advanced (confirming the updates to Telegram) after the inbox commit.
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        bot: Bot,
+        *,
+        allowed_updates: list[str],
+        polling_timeout: int = 25,
+    ) -> None:
+        self.session_factory = session_factory
+        self.bot = bot
+        self.allowed_updates = allowed_updates
+        self.polling_timeout = polling_timeout
+
+
+    async def run(self) -> None:
+        offset: Optional[int] = None
+        backoff = 1.0
+        while True:
+            try:
+                updates = await self.bot.get_updates(
+                    offset=offset,
+                    timeout=self.polling_timeout,
+                    allowed_updates=self.allowed_updates,
+                    request_timeout=self.polling_timeout + 10,
+                )
+                if updates:
+                    async with self.session_factory() as session:
+                        await InboxDAO.store(
+                            session,
+                            [(u.update_id, u.model_dump(mode="json", exclude_none=True)) for u in updates],
+                        )
+                        await session.commit()
+                    offset = updates[-1].update_id + 1
+                backoff = 1.0
+            except Exception as ex:
+                logger.error(f"Inbox polling failed, retrying in {backoff:.0f}s: {ex}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
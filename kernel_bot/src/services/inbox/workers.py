@@ -0,0 +1,109 @@
+from __future__ import annotations
+import asyncio
+
+from aiogram import Bot, Dispatcher
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core.shutdown import idle, shutting_down
+from src.services.db.data_access_module import InboxDAO, inbox_pending
+from src.services.db.models import InboxUpdate
+
+
+class InboxWorkers:
+    # N coroutines that lease updates from the inbox (FOR UPDATE SKIP LOCKED, so
+    # any number of processes and hosts can run them side by side) and feed them
+    # to the dispatcher.
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        bot: Bot,
+        dp: Dispatcher,
+        *,
+        workers: int = 4,
+        batch_size: int = 10,
+        lease_seconds: int = 60,
+        poll_interval: float = 1.0,
+        max_attempts: int = 5,
+        retention_seconds: int = 24 * 60 * 60,
+    ) -> None:
+        self.session_factory = session_factory
+        self.bot = bot
+        self.dp = dp
+        self.workers = workers
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retention_seconds = retention_seconds
+
+
+    async def run(self) -> None:
+        await asyncio.gather(
+            *(self._work(n) for n in range(self.workers)),
+            self._purge(),
+        )
+
+
+    async def _work(self, n: int) -> None:
+        # on shutdown the leased batch is finished first; updates left over when
+        # the drain deadline cancels it are handed out again after their lease
+        while not shutting_down.is_set():
+            try:
+                processed = await self.process_batch()
+            except Exception as ex:
+                logger.error(f"Inbox worker {n} failed: {ex}")
+                processed = 0
+
+            if processed == 0:
+                inbox_pending.clear()
+                await idle(self.poll_interval, inbox_pending)
+
+
+    async def process_batch(self) -> int:
+        async with self.session_factory() as session:
+            updates = await InboxDAO.claim(session, limit=self.batch_size, lease_seconds=self.lease_seconds)
+            await session.commit()
+
+        for upd in updates:
+            await self._process(upd)
+        return len(updates)
+
+
+    async def _process(self, upd: InboxUpdate) -> None:
+        # the root error handler swallows handler exceptions and reports them here
+        errors: list[Exception] = []
+        try:
+            await self.dp.feed_raw_update(self.bot, upd.payload, inbox_errors=errors)
+        except Exception as ex:
+            errors.append(ex)
+
+        if errors:
+            ex = errors[0]
+            error = f"{type(ex).__name__}: {ex}"
+            async with self.session_factory() as session:
+                if upd.attempts >= self.max_attempts:
+                    logger.error(f"Giving up on update {upd.update_id} after {upd.attempts} attempts: {error}")
+                    await InboxDAO.mark_processed(session, [upd.update_id], error=error)
+                else:
+                    await InboxDAO.release(session, upd.update_id, delay_seconds=2 ** upd.attempts, error=error)
+                await session.commit()
+            return
+
+        async with self.session_factory() as session:
+            await InboxDAO.mark_processed(session, [upd.update_id])
+            await session.commit()
+
+
+    async def _purge(self) -> None:
+        while not shutting_down.is_set():
+            await idle(self.retention_seconds / 24)
+            if shutting_down.is_set():
+                return
+            try:
+                async with self.session_factory() as session:
+                    await InboxDAO.purge_processed(session, older_than_seconds=self.retention_seconds)
+                    await session.commit()
+            except Exception as ex:
+                logger.error(f"Inbox purge failed: {ex}")
@@ -0,0 +1,94 @@
+from __future__ import annotations
+import asyncio
+from typing import Optional
+
+from aiogram import Bot
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core.shutdown import idle, shutting_down
+from src.core.utils import TimeTools
+from src.services.db.data_access_module import InviteDAO, OutboxDAO, invite_pool_taken
+
+
+class InvitePoolReplenisher:
+    # Keeps `size` unassigned join-request links in the invites table so that an
+    # approval only has to assign one (InviteDAO.assign_from_pool). Links whose
+    # remaining lifetime drops under min_remaining_seconds are retired and revoked
+    # on Telegram through the outbox.
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        bot: Bot,
+        *,
+        chat_id: int,
+        size: int = 10,
+        link_ttl_seconds: int = 24 * 60 * 60,
+        min_remaining_seconds: int = 12 * 60 * 60,
+        interval: float = 300.0,
+        concurrency: int = 2,
+    ) -> None:
+        self.session_factory = session_factory
+        self.bot = bot
+        self.chat_id = chat_id
+        self.size = size
+        self.link_ttl_seconds = link_ttl_seconds
+        self.min_remaining_seconds = min_remaining_seconds
+        self.interval = interval
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+
+    async def run(self) -> None:
+        while not shutting_down.is_set():
+            invite_pool_taken.clear()
+            try:
+                await self.replenish_once()
+            except Exception as ex:
+                logger.error(f"Invite pool replenish failed: {ex}")
+            await idle(self.interval, invite_pool_taken)
+
+
+    async def replenish_once(self) -> None:
+        min_expire_at = TimeTools.now_time_stamp() + self.min_remaining_seconds
+        async with self.session_factory() as session:
+            retired = await InviteDAO.retire_unassigned(
+                session,
+                chat_id=self.chat_id,
+                expire_before=min_expire_at,
+            )
+            for link in retired:
+                await OutboxDAO.enqueue(session, "revoke_chat_invite_link", chat_id=self.chat_id, invite_link=link)
+            available = await InviteDAO.count_unassigned(
+                session,
+                chat_id=self.chat_id,
+                min_expire_at=min_expire_at,
+            )
+            await session.commit()
+
+        missing = self.size - available
+        if missing <= 0:
+            return
+
+        expire_at = TimeTools.now_time_stamp() + self.link_ttl_seconds
+        created = await asyncio.gather(*(self._create_link(expire_at) for _ in range(missing)))
+        links = [(link, expire_at) for link in created if link is not None]
+        async with self.session_factory() as session:
+            await InviteDAO.create_many_unassigned(session, chat_id=self.chat_id, links=links)
+            await session.commit()
+        logger.info(f"Invite pool: {available + len(links)}/{self.size} links ready, {len(retired)} retired")
+
+
+    async def _create_link(self, expire_at: int) -> Optional[str]:
+        async with self._semaphore:
+            try:
+                link = await self.bot.create_chat_invite_link(
+                    chat_id=self.chat_id,
+                    name="personal:pool",
+                    expire_date=expire_at,
+                    creates_join_request=True,
+                )
+            except Exception as ex:
+                logger.warning(f"Cannot create pooled invite link: {ex}")
+                return None
+        return link.invite_link
@@ -0,0 +1,70 @@
+from __future__ import annotations
+import asyncio
+from uuid import UUID
+
+from aiogram import Bot
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core.shutdown import idle, shutting_down
+from src.core.utils import TimeTools
+from src.services.db.data_access_module import InviteDAO
+
+
+class InviteExpirySweeper:
+    # Revokes invite links whose expire_at has passed, on Telegram (best effort,
+    # the link is dead there anyway) and in the invites table, batch by batch.
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        bot: Bot,
+        *,
+        interval: float = 60.0,
+        batch_size: int = 200,
+        concurrency: int = 4,
+    ) -> None:
+        self.session_factory = session_factory
+        self.bot = bot
+        self.interval = interval
+        self.batch_size = batch_size
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+
+    async def run(self) -> None:
+        while not shutting_down.is_set():
+            try:
+                swept = await self.sweep_once()
+                if swept:
+                    logger.info(f"Invite sweeper revoked {swept} expired links")
+            except Exception as ex:
+                logger.error(f"Invite sweep failed: {ex}")
+            await idle(self.interval)
+
+
+    async def sweep_once(self) -> int:
+        swept = 0
+        while True:
+            now = TimeTools.now_time_stamp()
+            async with self.session_factory() as session:
+                expired = await InviteDAO.list_expired(session, now=now, limit=self.batch_size)
+            if not expired:
+                return swept
+
+            await asyncio.gather(*(self._revoke(chat_id, link) for _, chat_id, link in expired))
+            ids: list[UUID] = [invite_id for invite_id, _, _ in expired]
+            async with self.session_factory() as session:
+                await InviteDAO.mark_revoked(session, ids)
+                await session.commit()
+
+            swept += len(ids)
+            if len(expired) < self.batch_size:
+                return swept
+
+
+    async def _revoke(self, chat_id: int, invite_link: str) -> None:
+        async with self._semaphore:
+            try:
+                await self.bot.revoke_chat_invite_link(chat_id=chat_id, invite_link=invite_link)
+            except Exception as ex:
+                logger.debug(f"Cannot revoke expired invite link {invite_link}: {ex}")
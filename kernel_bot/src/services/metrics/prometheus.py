@@ -0,0 +1,193 @@
+from __future__ import annotations
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Iterator
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject, Update
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+from prometheus_client.registry import Collector
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+    from aiogram.methods import Response, TelegramMethod
+
+    from src.services.db.member_cache import MemberCache
+
+
+UPDATES = Counter(
+    "kernel_bot_updates_total",
+    "Updates fed to the dispatcher, by update type",
+    ["type"],
+)
+UPDATE_LATENCY = Histogram(
+    "kernel_bot_update_duration_seconds",
+    "Time to process one update, session commit included",
+    ["type"],
+)
+HANDLER_LATENCY = Histogram(
+    "kernel_bot_handler_duration_seconds",
+    "Handler run time",
+    ["router", "handler"],
+)
+HANDLER_ERRORS = Counter(
+    "kernel_bot_handler_errors_total",
+    "Handlers that raised",
+    ["router", "handler"],
+)
+TELEGRAM_LATENCY = Histogram(
+    "kernel_bot_telegram_request_duration_seconds",
+    "Bot API request latency, rate limiter wait excluded",
+    ["method"],
+)
+TELEGRAM_ERRORS = Counter(
+    "kernel_bot_telegram_request_errors_total",
+    "Bot API requests that failed",
+    ["method"],
+)
+TELEGRAM_QUEUE_DEPTH = Gauge(
+    "kernel_bot_telegram_queue_depth",
+    "Bot API calls waiting in the outbound scheduler, by priority",
+    ["priority"],
+)
+TELEGRAM_QUEUE_WAIT = Histogram(
+    "kernel_bot_telegram_queue_wait_seconds",
+    "Time from entering the outbound scheduler queue to being sent",
+    ["priority"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 15.0, 30.0, 60.0),
+)
+TELEGRAM_RETRY_AFTER = Counter(
+    "kernel_bot_telegram_retry_after_total",
+    "Flood control answers (429) from the Bot API",
+)
+DB_UP = Gauge(
+    "kernel_bot_db_up",
+    "1 while the last health ping of the primary succeeded",
+)
+DB_PING_LATENCY = Histogram(
+    "kernel_bot_db_ping_duration_seconds",
+    "Round trip of the background SELECT 1",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 3.0),
+)
+POOL_WAIT = Histogram(
+    "kernel_bot_db_pool_wait_seconds",
+    "Time spent waiting for a pooled connection",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 15.0),
+)
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    # dp.update outer middleware, registered ahead of UpdateSessionMiddleware
+    # (see MainHandler.make_dispatcher) so the latency includes the commit
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        kind = event.event_type if isinstance(event, Update) else type(event).__name__
+        UPDATES.labels(kind).inc()
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            UPDATE_LATENCY.labels(kind).observe(time.perf_counter() - started)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    # inner middleware, only runs once a handler's filters have matched
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        router = data["event_router"].name
+        name = getattr(data["handler"].callback, "__name__", "unknown")
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.labels(router, name).inc()
+            raise
+        finally:
+            HANDLER_LATENCY.labels(router, name).observe(time.perf_counter() - started)
+
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    # register innermost on the Bot session so queueing in the scheduler is not counted
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        api_method = method.__api_method__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception:
+            TELEGRAM_ERRORS.labels(api_method).inc()
+            raise
+        finally:
+            TELEGRAM_LATENCY.labels(api_method).observe(time.perf_counter() - started)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    # the engine's pool class; recreate() on dispose keeps the class, so the
+    # timing survives pool invalidation
+    def _do_get(self) -> Any:
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_WAIT.observe(time.perf_counter() - started)
+
+
+class PoolCollector(Collector):
+    def __init__(self, engine: AsyncEngine) -> None:
+        self.engine = engine
+
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        pool = self.engine.sync_engine.pool
+        if not isinstance(pool, QueuePool):
+            return
+        yield GaugeMetricFamily("kernel_bot_db_pool_size", "Configured pool size", value=pool.size())
+        yield GaugeMetricFamily("kernel_bot_db_pool_checked_out", "Connections in use", value=pool.checkedout())
+        yield GaugeMetricFamily("kernel_bot_db_pool_idle", "Idle pooled connections", value=pool.checkedin())
+        # negative while the pool has not opened pool_size connections yet
+        yield GaugeMetricFamily("kernel_bot_db_pool_overflow", "Connections above pool_size", value=pool.overflow())
+
+
+class MemberCacheCollector(Collector):
+    def __init__(self, cache: MemberCache) -> None:
+        self.cache = cache
+
+
+    def collect(self) -> Iterator[Metric]:
+        stats = self.cache.stats()
+        yield GaugeMetricFamily("kernel_bot_member_cache_size", "Cached members and known non-members", value=stats["size"])
+        yield CounterMetricFamily("kernel_bot_member_cache_hits", "Member lookups served from the cache", value=stats["hits"])
+        yield CounterMetricFamily("kernel_bot_member_cache_misses", "Member lookups that went to the database", value=stats["misses"])
+        yield CounterMetricFamily("kernel_bot_member_cache_evictions", "Entries dropped to stay under max_size", value=stats["evictions"])
+
+
+def instrument_dispatcher(dp: Dispatcher) -> None:
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    handler_metrics = HandlerMetricsMiddleware()
+    for name, observer in dp.observers.items():
+        if name not in ("update", "error"):
+            observer.middleware(handler_metrics)
+
+
+def register_pool(engine: AsyncEngine) -> None:
+    REGISTRY.register(PoolCollector(engine))
+
+
+def register_member_cache(cache: MemberCache) -> None:
+    REGISTRY.register(MemberCacheCollector(cache))
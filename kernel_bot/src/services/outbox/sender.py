@@ -0,0 +1,156 @@
+from __future__ import annotations
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core.shutdown import idle, shutting_down
+from src.services.db.data_access_module import OutboxDAO, outbox_pending
+from src.services.db.models import OutboxMessage
+
+
+@dataclass(slots=True)
+class _Outcome:
+    message_id: int
+    attempts: int
+    error: Optional[str] = None
+    retry_in: Optional[int] = None  # None with an error means the call can never succeed
+    held: bool = False  # not sent, an earlier message to the same chat is being retried
+
+
+class OutboxSender:
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        bot: Bot,
+        *,
+        batch_size: int = 50,
+        concurrency: int = 8,
+        poll_interval: float = 1.0,
+        lease_seconds: int = 60,
+        max_attempts: int = 8,
+        max_backoff_seconds: int = 600,
+        retention_seconds: int = 24 * 60 * 60,
+    ) -> None:
+        self.session_factory = session_factory
+        self.bot = bot
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.max_backoff_seconds = max_backoff_seconds
+        self.retention_seconds = retention_seconds
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+
+    async def run(self) -> None:
+        await asyncio.gather(self._send(), self._purge())
+
+
+    async def _send(self) -> None:
+        # a shutdown lets the batch being delivered finish
+        while not shutting_down.is_set():
+            outbox_pending.clear()
+            try:
+                processed = await self.drain_once()
+            except Exception as ex:
+                logger.error(f"Outbox drain failed: {ex}")
+                processed = 0
+
+            if processed < self.batch_size:
+                await idle(self.poll_interval, outbox_pending)
+
+
+    async def drain_once(self) -> int:
+        async with self.session_factory() as session:
+            messages = await OutboxDAO.lease_batch(
+                session,
+                limit=self.batch_size,
+                lease_seconds=self.lease_seconds,
+            )
+            await session.commit()
+        if not messages:
+            return 0
+
+        # chats are served concurrently, the messages of one chat in id order
+        by_chat: dict[Any, list[OutboxMessage]] = {}
+        for m in messages:
+            chat_id = m.payload.get("chat_id")
+            by_chat.setdefault(("message", m.id) if chat_id is None else chat_id, []).append(m)
+        outcomes = [o for chat in await asyncio.gather(*map(self._deliver_in_order, by_chat.values())) for o in chat]
+
+        async with self.session_factory() as session:
+            await OutboxDAO.mark_sent(session, [o.message_id for o in outcomes if o.error is None])
+            for o in outcomes:
+                if o.error is None:
+                    continue
+                if o.held:
+                    await OutboxDAO.reschedule(
+                        session, o.message_id, delay_seconds=o.retry_in or 0, error=o.error, count_attempt=False,
+                    )
+                elif o.retry_in is None or o.attempts >= self.max_attempts:
+                    logger.error(f"Outbox message {o.message_id} dropped after {o.attempts} attempts: {o.error}")
+                    await OutboxDAO.mark_failed(session, o.message_id, error=o.error)
+                else:
+                    await OutboxDAO.reschedule(session, o.message_id, delay_seconds=o.retry_in, error=o.error)
+            await session.commit()
+        return len(messages)
+
+
+    async def _deliver_in_order(self, messages: list[OutboxMessage]) -> list[_Outcome]:
+        # a failure that will be retried holds back the rest, e.g. a ban must
+        # not overtake the decline it follows
+        outcomes: list[_Outcome] = []
+        for n, m in enumerate(messages):
+            outcome = await self._deliver(m)
+            outcomes.append(outcome)
+            if outcome.error is not None and outcome.retry_in is not None and outcome.attempts < self.max_attempts:
+                outcomes.extend(
+                    _Outcome(
+                        message_id=later.id,
+                        attempts=later.attempts,
+                        error=f"Held back behind outbox message {m.id}",
+                        retry_in=outcome.retry_in,
+                        held=True,
+                    )
+                    for later in messages[n + 1:]
+                )
+                break
+        return outcomes
+
+
+    async def _deliver(self, message: OutboxMessage) -> _Outcome:
+        outcome = _Outcome(message_id=message.id, attempts=message.attempts)
+        call = getattr(self.bot, message.method, None)
+        if call is None:
+            outcome.error = f"Unknown Bot method: {message.method}"
+            return outcome
+
+        async with self._semaphore:
+            try:
+                await call(**message.payload)
+            except TelegramRetryAfter as ex:
+                outcome.error, outcome.retry_in = str(ex), int(ex.retry_after)
+            except (TelegramBadRequest, TelegramForbiddenError) as ex:
+                outcome.error = str(ex)
+            except Exception as ex:
+                outcome.error = str(ex)
+                outcome.retry_in = min(2 ** message.attempts, self.max_backoff_seconds)
+        return outcome
+
+
+    async def _purge(self) -> None:
+        while not shutting_down.is_set():
+            await idle(self.retention_seconds / 24)
+            if shutting_down.is_set():
+                return
+            try:
+                async with self.session_factory() as session:
+                    await OutboxDAO.purge_finished(session, older_than_seconds=self.retention_seconds)
+                    await session.commit()
+            except Exception as ex:
+                logger.error(f"Outbox purge failed: {ex}")
@@ -0,0 +1,228 @@
+from __future__ import annotations
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import TYPE_CHECKING, Iterable, Optional, Union
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods.base import TelegramType
+from loguru import logger
+
+from src.services.metrics.prometheus import TELEGRAM_QUEUE_DEPTH, TELEGRAM_QUEUE_WAIT, TELEGRAM_RETRY_AFTER
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+    from aiogram.methods import Response, TelegramMethod
+
+
+class Priority(IntEnum):
+    admin = 0
+    join_request = 1
+    bulk = 2
+
+
+# Telegram's per-chat limits are about messages posted into a chat; chat
+# administration (invite links, bans, join requests) only counts globally
+_PER_CHAT_PREFIXES = ("send", "copy", "forward", "edit")
+# a user is waiting on these, they go ahead of the sweeper and the invite pool
+_JOIN_REQUEST_DECISIONS = frozenset({"approveChatJoinRequest", "declineChatJoinRequest"})
+
+
+class _TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+
+    def reserve(self) -> float:
+        # takes a token, possibly going into debt; returns how long to wait for it
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+@dataclass(order=True, slots=True)
+class _Waiter:
+    priority: int
+    seq: int
+    future: asyncio.Future[None] = field(compare=False)
+    enqueued_at: float = field(compare=False)
+
+
+class OutboundScheduler(BaseRequestMiddleware):
+    # Bot session middleware: a message-producing call (send*, copy*, forward*,
+    # edit*) first waits for its chat's token bucket; every call addressed to a
+    # chat then queues for the global bucket, where admin traffic is served
+    # first, then join-request decisions, then the rest. Calls without a chat_id
+    # (getUpdates, answerCallbackQuery, answerInlineQuery, ...) are not throttled.
+
+    def __init__(
+        self,
+        *,
+        global_rate: float = 30.0,
+        private_chat_rate: float = 1.0,
+        group_chat_rate: float = 20 / 60,
+        burst: float = 3.0,
+        max_retries: int = 3,
+        admin_chat_ids: Iterable[int] = (),
+        max_idle_buckets: int = 10_000,
+    ) -> None:
+        self.global_rate = global_rate
+        self.private_chat_rate = private_chat_rate
+        self.group_chat_rate = group_chat_rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.admin_chat_ids = frozenset(admin_chat_ids)
+        self.max_idle_buckets = max_idle_buckets
+
+        self._global = _TokenBucket(global_rate, global_rate)
+        self._chats: dict[Union[int, str], _TokenBucket] = {}
+        self._queue: list[_Waiter] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._paused_until = 0.0
+        self._pump: Optional[asyncio.Task[None]] = None
+
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        api_method = method.__api_method__
+        per_chat = api_method.startswith(_PER_CHAT_PREFIXES)
+        if chat_id in self.admin_chat_ids:
+            priority = Priority.admin
+        elif api_method in _JOIN_REQUEST_DECISIONS:
+            priority = Priority.join_request
+        else:
+            priority = Priority.bulk
+        attempt = 0
+        while True:
+            await self._acquire(chat_id if per_chat else None, priority)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as ex:
+                TELEGRAM_RETRY_AFTER.inc()
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                # flood control applies to the whole bot, so hold back everyone
+                self._paused_until = max(self._paused_until, time.monotonic() + ex.retry_after)
+                logger.warning(f"Telegram asked to retry {type(method).__name__} in {ex.retry_after}s")
+
+
+    def reconfigure(
+        self,
+        *,
+        global_rate: float,
+        private_chat_rate: float,
+        group_chat_rate: float,
+        burst: float,
+        max_retries: int,
+    ) -> None:
+        # live rate changes; existing buckets keep their tokens but use the new rates
+        self.global_rate = global_rate
+        self.private_chat_rate = private_chat_rate
+        self.group_chat_rate = group_chat_rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self._global.rate = self._global.capacity = global_rate
+        for chat_id, bucket in self._chats.items():
+            private = isinstance(chat_id, int) and chat_id > 0
+            bucket.rate = private_chat_rate if private else group_chat_rate
+            bucket.capacity = burst
+
+
+    async def close(self) -> None:
+        if self._pump is not None:
+            self._pump.cancel()
+            try:
+                await self._pump
+            except asyncio.CancelledError:
+                pass
+            self._pump = None
+
+
+    async def _acquire(self, chat_id: Optional[Union[int, str]], priority: Priority) -> None:
+        if chat_id is not None:
+            delay = self._chat_bucket(chat_id).reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        waiter = _Waiter(
+            priority=priority,
+            seq=next(self._seq),
+            future=asyncio.get_running_loop().create_future(),
+            enqueued_at=time.monotonic(),
+        )
+        heapq.heappush(self._queue, waiter)
+        self._wakeup.set()
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._run_pump(), name="outbound-scheduler")
+        depth = TELEGRAM_QUEUE_DEPTH.labels(priority.name)
+        depth.inc()
+        try:
+            await waiter.future
+        finally:
+            depth.dec()
+
+
+    def _chat_bucket(self, chat_id: Union[int, str]) -> _TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.max_idle_buckets:
+                self._drop_full_buckets()
+            private = isinstance(chat_id, int) and chat_id > 0
+            rate = self.private_chat_rate if private else self.group_chat_rate
+            bucket = self._chats[chat_id] = _TokenBucket(rate, self.burst)
+        return bucket
+
+
+    def _drop_full_buckets(self) -> None:
+        now = time.monotonic()
+        for chat_id, bucket in list(self._chats.items()):
+            if bucket.tokens + (now - bucket.updated_at) * bucket.rate >= bucket.capacity:
+                del self._chats[chat_id]
+
+
+    async def _run_pump(self) -> None:
+        while True:
+            while self._queue and self._queue[0].future.done():
+                heapq.heappop(self._queue)  # caller was cancelled while waiting
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            delay = self._global.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            # pop only after waiting, an admin call may have arrived in the meantime
+            while self._queue:
+                waiter = heapq.heappop(self._queue)
+                if waiter.future.done():
+                    continue
+                TELEGRAM_QUEUE_WAIT.labels(Priority(waiter.priority).name).observe(time.monotonic() - waiter.enqueued_at)
+                waiter.future.set_result(None)
+                break
@@ -0,0 +1,113 @@
+from __future__ import annotations
+from typing import Awaitable, Callable, Optional
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from loguru import logger
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from src.core import json_codec
+from src.services.db.health import DbHealthMonitor
+
+
+class WebServer:
+    def __init__(self, *, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+        self.app = web.Application(middlewares=[self._refuse_updates_when_draining])
+        self._runner: Optional[web.AppRunner] = None
+        self._webhook_path: Optional[str] = None
+        self._health: Optional[DbHealthMonitor] = None
+        self.draining = False
+
+
+    def attach_webhook(
+        self,
+        *,
+        dp: Dispatcher,
+        bot: Bot,
+        path: str,
+        secret_token: str,
+    ) -> None:
+        # SimpleRequestHandler rejects requests without a matching
+        # X-Telegram-Bot-Api-Secret-Token header and answers Telegram right away,
+        # handing the update to the dispatcher in a background task.
+        SimpleRequestHandler(
+            dispatcher=dp,
+            bot=bot,
+            secret_token=secret_token,
+        ).register(self.app, path=path)
+        setup_application(self.app, dp, bot=bot)
+        self._webhook_path = path
+
+
+    @web.middleware
+    async def _refuse_updates_when_draining(
+        self,
+        request: web.Request,
+        handler: Callable[[web.Request], Awaitable[web.StreamResponse]],
+    ) -> web.StreamResponse:
+        # Telegram redelivers an update answered with an error, by then to the
+        # replica that replaced this one; probes and /metrics keep working
+        if self.draining and request.path == self._webhook_path:
+            return web.Response(status=503, text="shutting down")
+        return await handler(request)
+
+
+    def attach_metrics(self, path: str = "/metrics") -> None:
+        self.app.router.add_get(path, self._metrics)
+
+
+    def attach_health(
+        self,
+        monitor: DbHealthMonitor,
+        *,
+        live_path: str = "/health/live",
+        ready_path: str = "/health/ready",
+    ) -> None:
+        # live: the event loop turns and the monitor keeps pinging; ready: the
+        # database answers and this replica is not shutting down
+        self._health = monitor
+        self.app.router.add_get(live_path, self._live)
+        self.app.router.add_get(ready_path, self._ready)
+
+
+    async def _live(self, request: web.Request) -> web.Response:
+        assert self._health
+        ok = self._health.fresh()
+        return web.json_response(
+            {"status": "ok" if ok else "stuck", "db": self._health.status()},
+            status=200 if ok else 503,
+            dumps=json_codec.dumps,
+        )
+
+
+    async def _ready(self, request: web.Request) -> web.Response:
+        assert self._health
+        ok = self._health.ready() and not self.draining
+        status = "ready" if ok else "draining" if self.draining else "db unavailable"
+        return web.json_response(
+            {"status": status, "db": self._health.status()},
+            status=200 if ok else 503,
+            dumps=json_codec.dumps,
+        )
+
+
+    @staticmethod
+    async def _metrics(request: web.Request) -> web.Response:
+        return web.Response(body=generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host=self.host, port=self.port)
+        await site.start()
+        logger.info(f"HTTP server is listening on {self.host}:{self.port}")
+
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,90 @@
+from __future__ import annotations
+import asyncio
+from typing import Any
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+
+from src.services.db.data_access_module import InboxDAO
+from src.services.db.models import InboxUpdate
+from src.services.handlers.main_handler import MainHandler
+from src.services.inbox.workers import InboxWorkers
+
+
+PAYLOAD = {
+    "update_id": 7,
+    "message": {
+        "message_id": 1,
+        "date": 1760000000,
+        "chat": {"id": 42, "type": "private", "first_name": "Test"},
+        "from": {"id": 42, "is_bot": False, "first_name": "Test"},
+        "text": "boom",
+    },
+}
+
+
+class _Session:
+    async def __aenter__(self) -> _Session:
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        return None
+
+    async def commit(self) -> None:
+        return None
+
+
+def _dispatcher(handled: list[str]) -> Dispatcher:
+    # the production root router, so its error handler sits between the failing
+    # handler and the worker
+    failing = Router(name="failing")
+
+    @failing.message()
+    async def explode(msg: Message) -> None:
+        handled.append(msg.text or "")
+        raise RuntimeError("handler failed")
+
+    main = MainHandler()
+    main.main_router.include_router(failing)
+    main.attach_fallbacks()
+    dp = Dispatcher()
+    dp.include_router(main.main_router)
+    return dp
+
+
+@pytest.fixture
+def inbox_calls(monkeypatch: pytest.MonkeyPatch) -> list[tuple[str, Any]]:
+    calls: list[tuple[str, Any]] = []
+
+    async def release(session: Any, update_id: int, *, delay_seconds: int, error: str) -> None:
+        calls.append(("release", (update_id, delay_seconds, error)))
+
+    async def mark_processed(session: Any, update_ids: list[int], *, error: Any = None) -> None:
+        calls.append(("mark_processed", (update_ids, error)))
+
+    monkeypatch.setattr(InboxDAO, "release", staticmethod(release))
+    monkeypatch.setattr(InboxDAO, "mark_processed", staticmethod(mark_processed))
+    return calls
+
+
+def _workers(dp: Dispatcher, **kwargs: Any) -> InboxWorkers:
+    return InboxWorkers(_Session, Bot(token="42:TEST"), dp, **kwargs)  # type: ignore[arg-type]
+
+
+def test_failed_handler_releases_update_for_retry(inbox_calls: list[tuple[str, Any]]) -> None:
+    handled: list[str] = []
+    workers = _workers(_dispatcher(handled), max_attempts=5)
+
+    asyncio.run(workers._process(InboxUpdate(update_id=7, payload=PAYLOAD, attempts=2)))
+
+    assert handled == ["boom"]
+    assert inbox_calls == [("release", (7, 4, "RuntimeError: handler failed"))]
+
+
+def test_failed_handler_gives_up_after_max_attempts(inbox_calls: list[tuple[str, Any]]) -> None:
+    workers = _workers(_dispatcher([]), max_attempts=5)
+
+    asyncio.run(workers._process(InboxUpdate(update_id=7, payload=PAYLOAD, attempts=5)))
+
+    assert inbox_calls == [("mark_processed", ([7], "RuntimeError: handler failed"))]
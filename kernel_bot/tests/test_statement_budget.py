@@ -0,0 +1,102 @@
+from __future__ import annotations
+import asyncio
+from typing import Any, AsyncGenerator, Awaitable, Callable, Optional
+
+import pytest
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiogram.types import Message
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.core.settings import get_settings
+from src.services.db import statement_budget
+from src.services.db.models import Application, OutboxMessage
+from src.services.db.statement_budget import assert_max_statements
+from src.services.handlers.apply import cmd_apply
+from src.services.handlers.main_handler import HandlerDeps
+
+
+# Needs the Postgres from .env with the schema applied, skipped otherwise. The
+# rows are created with ids far outside the real range and removed again.
+TG_ID = 9_100_000_000_001
+ADMIN_ID = 9_100_000_000_002
+
+
+class _RecordingSession(BaseSession):
+    # answers every Bot API call with None instead of sending it
+    def __init__(self) -> None:
+        super().__init__()
+        self.methods: list[str] = []
+
+    async def close(self) -> None:
+        return None
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[Any], timeout: Optional[int] = None) -> Any:
+        self.methods.append(method.__api_method__)
+        return None
+
+    async def stream_content(self, *args: Any, **kwargs: Any) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+
+def _message(bot: Bot, text: str) -> Message:
+    return Message.model_validate({
+        "message_id": 1,
+        "date": 1760000000,
+        "chat": {"id": TG_ID, "type": "private", "first_name": "Budget"},
+        "from": {"id": TG_ID, "is_bot": False, "first_name": "Budget", "username": "statement_budget"},
+        "text": text,
+    }).as_(bot)
+
+
+async def _with_postgres(check: Callable[[async_sessionmaker[AsyncSession]], Awaitable[None]]) -> None:
+    try:
+        url = get_settings().postgres.url
+    except Exception as ex:
+        pytest.skip(f"no Postgres settings: {ex}")
+    engine = create_async_engine(url)
+    try:
+        try:
+            async with engine.connect():
+                pass
+        except Exception as ex:
+            pytest.skip(f"Postgres is not reachable: {ex}")
+        statement_budget.install(engine)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+        async def cleanup() -> None:
+            async with session_factory() as session:
+                await session.execute(delete(Application).where(Application.tg_user_id == TG_ID))
+                await session.execute(delete(OutboxMessage).where(OutboxMessage.payload["chat_id"].as_string() == str(ADMIN_ID)))
+                await session.commit()
+
+        await cleanup()
+        try:
+            await check(session_factory)
+        finally:
+            await cleanup()
+    finally:
+        await engine.dispose()
+
+
+def test_apply_stays_within_its_statement_budget() -> None:
+    async def check(session_factory: async_sessionmaker[AsyncSession]) -> None:
+        bot_session = _RecordingSession()
+        bot = Bot(token="42:TEST", session=bot_session)
+        deps = HandlerDeps(session_factory=session_factory, group_chat_id=-1, admin_user_id=ADMIN_ID)
+
+        # member lookup, the application insert, the outbox insert for the admin
+        async with session_factory() as session:
+            with assert_max_statements(3):
+                await cmd_apply(_message(bot, "/apply"), session=session, deps=deps)
+
+        # applying again finds the pending application instead of creating one
+        async with session_factory() as session:
+            with assert_max_statements(3):
+                await cmd_apply(_message(bot, "/apply"), session=session, deps=deps)
+
+        assert bot_session.methods == ["sendMessage", "sendMessage"]
+
+    asyncio.run(_with_postgres(check))